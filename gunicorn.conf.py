@@ -0,0 +1,38 @@
+import glob
+import os
+
+pythonpath = 'src'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+# The app, parsers, holiday calendar and templates are loaded once in the master, then forked
+preload_app = True
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 0))
+accesslog = '-'
+
+# Workers are separate processes, so metrics and cached parses are shared through these directories
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+os.environ.setdefault('METRICS_DIR', os.path.join(APP_DIR, 'metrics'))
+os.environ.setdefault('PARSE_CACHE_DIR', os.path.join(APP_DIR, 'parse_cache'))
+
+
+def on_starting(server):
+    # Counters start from zero with the server, so drop the previous run's worker snapshots
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    import web_app
+    web_app.reopen_stores()
+
+
+def worker_exit(server, worker):
+    import web_app
+    # Leave headroom inside graceful_timeout, after which the master kills the worker
+    web_app.shutdown(max(graceful_timeout - 5, 1))
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class VerifierBusy(Exception):
+    """Raised when too many password checks are already waiting for the bcrypt pool."""
+
+
+class PasswordVerifier:
+    """Runs password checks on a bounded thread pool and remembers recent successes so repeat logins skip the rehash."""
+    def __init__(self, check, workers=2, max_pending=16, cache_ttl=300, timeout=10):
+        self.check = check
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        # Cache keys are keyed HMACs so the in-memory cache never holds anything crackable offline
+        self.key = os.urandom(32)
+        self.verified = {}
+        self.lock = threading.Lock()
+
+    def _cache_key(self, password, hashed):
+        return hmac.new(self.key, f'{hashed}\0{password}'.encode('utf-8'), hashlib.sha256).digest()
+
+    def verify(self, password, hashed):
+        """Return True if password matches hashed. Raises VerifierBusy or concurrent.futures.TimeoutError under overload."""
+        key = self._cache_key(password, hashed)
+        now = time.monotonic()
+        with self.lock:
+            expires = self.verified.get(key)
+            if expires and expires > now:
+                return True
+        if not self.slots.acquire(blocking=False):
+            raise VerifierBusy()
+        try:
+            future = self.executor.submit(self.check, password, hashed)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        ok = future.result(timeout=self.timeout)
+        if ok:
+            with self.lock:
+                if len(self.verified) > 1024:
+                    self.verified = {k: t for k, t in self.verified.items() if t > now}
+                self.verified[key] = now + self.cache_ttl
+        return ok
+
+
+class LoginThrottle:
+    """Sliding window of failed logins per client address, in SQLite so every worker process sees the same failures."""
+    def __init__(self, max_failures=5, window=300, db_path=':memory:'):
+        self.max_failures = max_failures
+        self.window = window
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        with self.lock, self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS login_failures (client TEXT NOT NULL, failed_at REAL NOT NULL)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS login_failures_client ON login_failures (client, failed_at)')
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+
+    def reopen(self):
+        """Open a fresh connection, e.g. in a worker process forked after the throttle was created."""
+        with self.lock:
+            self.conn = self._connect()
+
+    def allowed(self, client):
+        with self.lock:
+            recent = self.conn.execute(
+                'SELECT COUNT(*) FROM login_failures WHERE client = ? AND failed_at > ?', (client, time.time() - self.window)
+            ).fetchone()[0]
+        return recent < self.max_failures
+
+    def failed(self, client):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute('INSERT INTO login_failures (client, failed_at) VALUES (?, ?)', (client, now))
+            self.conn.execute('DELETE FROM login_failures WHERE failed_at <= ?', (now - self.window,))
+
+    def reset(self, client):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM login_failures WHERE client = ?', (client,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,248 @@
+"""Parser benchmarks on synthetic AC01/BC04 pastes and GR11/CW09 spreadsheets.
+
+    python src/benchmark.py --jobs 5000 --save bench_baseline.json
+    python src/benchmark.py --jobs 5000 --baseline bench_baseline.json
+    python src/benchmark.py --startup
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import resource
+import string
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(__file__))
+from job_parser_core import JobParser, BC04Parser, SpreadsheetParser, JOB_FIELDS, GR11_FIELDNAMES
+
+TOWNS = [('LEICESTER', 'LE1 1AA'), ('CORBY', 'NN18 8EZ'), ('LLANELLI', 'SA15 4DW'), ('FAREHAM', 'PO14 1UX'), ('STOKE', 'ST4 4EX'), ('BRISTOL', 'BS3 5RN')]
+STREETS = ['Sandy Road', 'High Street', 'Speedfields Park', 'St. Margarets Way', 'Station Road', 'Lea Valley Road']
+MODELS = ['FORD FIESTA', 'VAUXHALL CORSA', 'VW GOLF', 'KIA CEED', 'Transit Custom', 'TOYOTA YARIS', 'Astra']
+
+
+def random_reg(rng):
+    letters = string.ascii_uppercase
+    return ''.join(rng.choice(letters) for _ in range(2)) + f'{rng.randint(10, 99)}' + ''.join(rng.choice(letters) for _ in range(3))
+
+
+def random_phone(rng):
+    return '01' + ''.join(rng.choice(string.digits) for _ in range(9))
+
+
+def generate_ac01(n, seed=1):
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(n):
+        c_town, c_pc = rng.choice(TOWNS)
+        d_town, d_pc = rng.choice(TOWNS)
+        blocks.append(
+            f'FROM\n{rng.randint(1, 99)} {rng.choice(STREETS)}\nTel: {random_phone(rng)}\n{c_town}\n{c_pc}\n'
+            f'TO\nDealer {i}\n{rng.choice(STREETS)}\n{d_town}\n{d_pc}\n'
+        )
+    return 'Release codes\n' + ''.join(blocks)
+
+
+def generate_bc04(n, seed=2):
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(n):
+        c_town, c_pc = rng.choice(TOWNS)
+        d_town, d_pc = rng.choice(TOWNS)
+        price = rng.randint(50, 300)
+        blocks.append(
+            f'Job Sheet\nJob Number\n{11120000 + i}/1\nSpecial Instructions\n'
+            f'Dealer {i}\n{rng.choice(STREETS)}\n{c_town}\n{c_pc}\n'
+            f'BCA Fleet Solutions Ltd\n{d_town}\n{d_pc}\n'
+            f'{random_reg(rng)} {rng.randint(10 ** 11, 10 ** 12 - 1)} {rng.choice(MODELS)}\n'
+            f'{random_phone(rng)} {random_phone(rng)}\n20/06/2025\n24/06/2025\n'
+            f'┬ú {price / 2:.2f} ┬ú {price:.2f}\n'
+        )
+    return ''.join(blocks)
+
+
+def generate_gr11(n, fmt='csv', seed=3):
+    """Return an in-memory spreadsheet upload with the GR11/CW09 dealer columns."""
+    import pandas as pd
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        town, pc = rng.choice(TOWNS)
+        rows.append({
+            'Reg No': random_reg(rng),
+            'Model': rng.choice(MODELS),
+            'Chassis': 'WF0' + ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(14)),
+            'PDI Centre': rng.choice(['Upper Heyford', 'High Ercall']),
+            'Delivery Due Date': '01/07/2025',
+            'Delivery Address': f'Dealer {i}, {rng.randint(1, 99)} {rng.choice(STREETS)}, {town}, {pc}',
+            'Price': rng.randint(50, 300),
+            'Special Instructions': rng.choice(['', 'Call ahead']),
+        })
+    df = pd.DataFrame(rows)
+    data = io.BytesIO()
+    if fmt == 'xlsx':
+        df.to_excel(data, index=False)
+    else:
+        df.to_csv(data, index=False)
+    data.seek(0)
+    data.filename = f'gr11.{fmt}'
+    return data
+
+
+def write_csv(jobs, fieldnames):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(fieldnames)
+    writer.writerows(job.to_row(fieldnames) for job in jobs)
+    return output.tell()
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def time(self, name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.stages[name] = round(time.perf_counter() - start, 4)
+        return result
+
+
+def bench_paste(parser_class, text):
+    timer = StageTimer()
+    timer.time('tokenize', lambda: list(parser_class('20/06/2025').iter_job_texts(text)))
+    jobs = timer.time('parse', parser_class('20/06/2025', '24/06/2025').parse_jobs, text)
+    timer.time('csv', write_csv, jobs, JOB_FIELDS)
+    return len(jobs), timer.stages
+
+
+def bench_spreadsheet(upload):
+    timer = StageTimer()
+    parser = SpreadsheetParser()
+    df = timer.time('read', parser.read, upload)
+    jobs = timer.time('parse', parser.parse_dataframe, df)
+    timer.time('csv', write_csv, jobs, GR11_FIELDNAMES)
+    return len(jobs), timer.stages
+
+
+def run_case(name, n, fmt):
+    """Run one benchmark case; called in a fresh process so peak RSS is per case."""
+    if name == 'AC01':
+        jobs, stages = bench_paste(JobParser, generate_ac01(n))
+    elif name == 'BC04':
+        jobs, stages = bench_paste(BC04Parser, generate_bc04(n))
+    else:
+        jobs, stages = bench_spreadsheet(generate_gr11(n, fmt))
+    # parse_jobs tokenizes as it goes, so the separate tokenize timing is reported but not added to the total
+    total = sum(t for stage, t in stages.items() if stage != 'tokenize')
+    return {
+        'jobs': jobs,
+        'seconds': round(total, 4),
+        'jobs_per_sec': round(jobs / total, 1) if total else None,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'stages': stages,
+    }
+
+
+# Heavy dependencies that web_app should only import on first use
+LAZY_MODULES = ('pandas', 'numpy', 'openpyxl', 'holidays', 'bcrypt')
+
+
+def import_times(module='web_app'):
+    """Return (name, depth, self_us, cumulative_us) for each import made by `python -X importtime -c 'import module'`."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative)))
+    return rows
+
+
+def startup_report(module='web_app', top=15):
+    """Cold-start import cost of module, broken down by its slowest direct imports."""
+    rows = import_times(module)
+    # importtime lists children before their parent, so module's direct imports are the depth-1 rows just above it
+    end = max(i for i, (name, depth, _, _) in enumerate(rows) if name == module and depth == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    _, _, body, total = rows[end]
+    direct = sorted(((name, cumulative) for name, depth, _, cumulative in rows[start:end] if depth == 1), key=lambda r: -r[1])
+    return {
+        'module': module,
+        'total_ms': round(total / 1000, 1),
+        'body_ms': round(body / 1000, 1),
+        'imports_ms': {name: round(cumulative / 1000, 1) for name, cumulative in direct[:top]},
+        'eager': [name for name in LAZY_MODULES if any(row[0] == name for row in rows)],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages for cases whose throughput dropped more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('jobs_per_sec') or not result['jobs_per_sec']:
+            continue
+        change = result['jobs_per_sec'] / base['jobs_per_sec'] - 1
+        if change < -tolerance:
+            regressions.append(f'{name}: {result["jobs_per_sec"]} jobs/sec vs baseline {base["jobs_per_sec"]} ({change:+.0%})')
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--jobs', type=int, default=2000, help='jobs per synthetic input')
+    ap.add_argument('--cases', default='AC01,BC04,GR11', help='comma separated: AC01,BC04,GR11')
+    ap.add_argument('--format', default='csv', choices=['csv', 'xlsx'], help='GR11 spreadsheet format')
+    ap.add_argument('--save', help='write results to this JSON file')
+    ap.add_argument('--baseline', help='compare against this JSON file and exit 1 on regression')
+    ap.add_argument('--tolerance', type=float, default=0.2, help='allowed jobs/sec drop before failing')
+    ap.add_argument('--startup', action='store_true', help='report the import time of web_app in a fresh interpreter instead')
+    args = ap.parse_args(argv)
+
+    if args.startup:
+        report = startup_report()
+        print(f'import {report["module"]}: {report["total_ms"]} ms ({report["body_ms"]} ms in the module body)')
+        for name, ms in report['imports_ms'].items():
+            print(f'  {ms:8.1f} ms  {name}')
+        print('eagerly imported: ' + (', '.join(report['eager']) or 'none of ' + ', '.join(LAZY_MODULES)))
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump({'python': sys.version.split()[0], 'startup': report}, f, indent=2)
+        return 0
+
+    results = {}
+    for name in args.cases.split(','):
+        key = f'{name}.{args.format}' if name == 'GR11' else name
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results[key] = executor.submit(run_case, name, args.jobs, args.format).result()
+        r = results[key]
+        stages = ' '.join(f'{k}={v}s' for k, v in r['stages'].items())
+        print(f'{key}: {r["jobs"]} jobs in {r["seconds"]}s, {r["jobs_per_sec"]} jobs/sec, peak RSS {r["peak_rss_kb"] // 1024} MB ({stages})')
+
+    report = {'jobs': args.jobs, 'python': sys.version.split()[0], 'results': results}
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+
+def job_fingerprint(reg, vin, collection_date):
+    """16-byte key for a collection: REG NUMBER + VIN + collection date, ignoring case and spaces. None without a reg or VIN."""
+    reg = ''.join(str(reg or '').split()).upper()
+    vin = ''.join(str(vin or '').split()).upper()
+    if not reg and not vin:
+        return None
+    return hashlib.blake2b(f'{reg}\0{vin}\0{collection_date or ""}'.encode('utf-8'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte fingerprints, using double hashing on the two halves of the digest."""
+    def __init__(self, bits, hashes, array=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = array if array is not None else bytearray((bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        return cls(bits, max(1, round(bits / capacity * math.log(2))))
+
+    def _positions(self, fingerprint):
+        h1, h2 = struct.unpack('<QQ', fingerprint)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, fingerprint):
+        for pos in self._positions(fingerprint):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, fingerprint):
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fingerprint))
+
+
+class SeenJobs:
+    """Fingerprints of every parsed job in SQLite, with a Bloom filter in front so most new jobs never touch the disk.
+
+    The filter is saved next to the database with the last row it covers, so a restart only loads rows added since.
+    It is saved at most every save_interval seconds and on close, outside the lock; a stale file only means more rows
+    to load. Rows added by other worker processes are picked up the same way before each check.
+    """
+    def __init__(self, db_path, capacity=1000000, error_rate=0.001, save_interval=60):
+        self.db_path = db_path
+        self.bloom_path = db_path + '.bloom'
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.save_interval = save_interval
+        self.saved_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.conn = self._connect()
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen_jobs (id INTEGER PRIMARY KEY, fingerprint BLOB NOT NULL UNIQUE)'
+            )
+        self.bloom = None
+        self.synced = 0
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def reopen(self):
+        """Open a fresh connection, e.g. in a worker process forked after the store was created."""
+        with self.lock:
+            self.conn = self._connect()
+
+    def _load_bloom(self):
+        bloom = BloomFilter.for_capacity(self.capacity, self.error_rate)
+        try:
+            with open(self.bloom_path, 'rb') as f:
+                bits, hashes, synced = struct.unpack('<QQQ', f.read(24))
+                array = bytearray(f.read())
+            if (bits, hashes) == (bloom.bits, bloom.hashes) and len(array) == len(bloom.array):
+                bloom.array = array
+                self.synced = synced
+        except (OSError, struct.error):
+            pass
+        self.bloom = bloom
+
+    def _save_bloom(self, force=False):
+        """Write a copy of the filter, unless it was saved within save_interval or another thread is saving it."""
+        if not self.save_lock.acquire(blocking=force):
+            return
+        try:
+            with self.lock:
+                if self.bloom is None or (not force and time.monotonic() - self.saved_at < self.save_interval):
+                    return
+                self.saved_at = time.monotonic()
+                header = struct.pack('<QQQ', self.bloom.bits, self.bloom.hashes, self.synced)
+                array = bytes(self.bloom.array)
+            tmp_path = f'{self.bloom_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(header)
+                f.write(array)
+            os.replace(tmp_path, self.bloom_path)
+        finally:
+            self.save_lock.release()
+
+    def _sync(self):
+        if self.bloom is None:
+            self._load_bloom()
+        for row_id, fingerprint in self.conn.execute('SELECT id, fingerprint FROM seen_jobs WHERE id > ? ORDER BY id', (self.synced,)):
+            self.bloom.add(fingerprint)
+            self.synced = row_id
+
+    def _seen(self, fingerprint):
+        return fingerprint in self.bloom and self.conn.execute(
+            'SELECT 1 FROM seen_jobs WHERE fingerprint = ?', (fingerprint,)
+        ).fetchone() is not None
+
+    def check(self, fingerprints):
+        """Return, for each fingerprint, whether it was already recorded. None entries are never duplicates."""
+        with self.lock:
+            self._sync()
+            return [fp is not None and self._seen(fp) for fp in fingerprints]
+
+    def check_and_add(self, fingerprints):
+        """Like check, but also counts repeats within this batch and records the new fingerprints."""
+        with self.lock:
+            self._sync()
+            batch = set()
+            duplicates = []
+            for fp in fingerprints:
+                duplicates.append(fp is not None and (fp in batch or self._seen(fp)))
+                if fp is not None:
+                    batch.add(fp)
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO seen_jobs (fingerprint) VALUES (?)', [(fp,) for fp in batch]
+                )
+            self._sync()
+        if batch:
+            self._save_bloom()
+        return duplicates
+
+    def close(self):
+        self._save_bloom(force=True)
+        with self.lock:
+            self.conn.close()
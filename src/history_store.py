@@ -0,0 +1,311 @@
+import csv
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+
+
+class HistoryStore:
+    """Append-only job history in SQLite, indexed for filtered, paginated queries.
+
+    Writes go through one writer thread that group-commits whatever queued up within flush_interval seconds, so
+    request threads never wait on a commit. SQLite makes each commit atomic and durable (WAL, synchronous=FULL) and
+    its file locks serialize writers across worker processes. Reads use a read-only connection per thread, which WAL
+    lets run alongside a commit; self.lock only guards the writer connection.
+    """
+    COLUMNS = ('timestamp', 'job_type', 'csv_path', 'user')
+    # Exported columns that /search can look jobs up by
+    INDEX_FIELDS = ('REG NUMBER', 'VIN', 'YOUR REF NO')
+
+    def __init__(self, db_path, legacy_json=None, flush_interval=0.2, max_retries=5):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.pending = queue.Queue()
+        self.writer = None
+        # Writes given up on since the store was opened, so shutdown can report them
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.readers = []
+        self.readers_lock = threading.Lock()
+        self.conn = self._connect()
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS history ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, job_type TEXT, csv_path TEXT, user TEXT)'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS history_job_type ON history (job_type, timestamp)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS history_user ON history (user, timestamp)')
+            # Background parse records, shared so any worker process can answer /jobs/<id>
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS parse_jobs (id TEXT PRIMARY KEY, record TEXT NOT NULL)'
+            )
+            # Lookup index from normalized REG/VIN/ref to the history CSV row that holds it
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS job_index ('
+                'key TEXT NOT NULL, field TEXT NOT NULL, csv_path TEXT NOT NULL, row INTEGER NOT NULL, job_type TEXT, timestamp TEXT)'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS job_index_key ON job_index (key, timestamp DESC)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS indexed_files (csv_path TEXT PRIMARY KEY)')
+        if legacy_json and os.path.exists(legacy_json) and not self.count():
+            self.import_json(legacy_json)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=FULL')
+        return conn
+
+    def _reader(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+            conn.execute('PRAGMA query_only=ON')
+            with self.readers_lock:
+                self.readers.append(conn)
+        return conn
+
+    def reopen(self):
+        """Open a fresh connection and writer, e.g. in a worker process forked after the store was created."""
+        with self.lock:
+            self.conn = self._connect()
+            self.local = threading.local()
+            self.readers = []
+            self.pending = queue.Queue()
+            self.writer = None
+
+    def _write(self, op, *args):
+        if self.writer is None:
+            with self.lock:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+                    self.writer.start()
+        self.pending.put((op, args))
+
+    def _write_loop(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            ops = [op for op in batch if op is not None]
+            delay = 0.1
+            for attempt in range(self.max_retries + 1):
+                if not ops:
+                    break
+                try:
+                    self._commit(ops)
+                    break
+                except sqlite3.OperationalError as e:
+                    # Another process holding the write lock past the busy timeout is worth retrying; disk I/O
+                    # errors, a read-only database and the like are not
+                    if ('locked' not in str(e) and 'busy' not in str(e)) or attempt == self.max_retries:
+                        self._drop(ops)
+                        break
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5)
+                except Exception:
+                    # Anything else will not succeed on retry, and must not stop the writer
+                    self._drop(ops)
+                    break
+            for _ in batch:
+                self.pending.task_done()
+            if batch[-1] is None:
+                return
+
+    def _drop(self, ops):
+        traceback.print_exc()
+        print(f'history writer: dropped {len(ops)} write(s) to {self.db_path}', file=sys.stderr)
+        self.dropped += len(ops)
+
+    def _commit(self, ops):
+        with self.lock, self.conn:
+            for op, args in ops:
+                if op == 'history':
+                    self.conn.execute('INSERT INTO history (timestamp, job_type, csv_path, user) VALUES (?, ?, ?, ?)', args)
+                elif op == 'job':
+                    self.conn.execute('INSERT OR REPLACE INTO parse_jobs (id, record) VALUES (?, ?)', args)
+                elif op == 'delete_jobs':
+                    self.conn.executemany('DELETE FROM parse_jobs WHERE id = ?', [(job_id,) for job_id in args[0]])
+                elif op == 'index':
+                    csv_path, entries = args
+                    if self.conn.execute('INSERT OR IGNORE INTO indexed_files (csv_path) VALUES (?)', (csv_path,)).rowcount:
+                        self.conn.executemany(
+                            'INSERT INTO job_index (key, field, csv_path, row, job_type, timestamp) VALUES (?, ?, ?, ?, ?, ?)', entries
+                        )
+
+    def flush(self, timeout=None):
+        """Wait until every queued write is committed. Returns False if timeout ran out first."""
+        with self.pending.all_tasks_done:
+            return self.pending.all_tasks_done.wait_for(lambda: not self.pending.unfinished_tasks, timeout)
+
+    def import_json(self, path):
+        """Load a job_history.json list (newest first) into the store."""
+        with open(path, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO history (timestamp, job_type, csv_path, user) VALUES (?, ?, ?, ?)',
+                [tuple(row.get(c) for c in self.COLUMNS) for row in reversed(history)]
+            )
+
+    def append(self, record):
+        self._write('history', *(record.get(c) for c in self.COLUMNS))
+
+    def _where(self, job_type=None, user=None, start=None, end=None):
+        clauses, params = [], []
+        if job_type:
+            clauses.append('job_type = ?')
+            params.append(job_type)
+        if user:
+            clauses.append('user = ?')
+            params.append(user)
+        # Timestamps are stored as YYYYMMDD_HHMMSS, so date prefixes compare correctly as strings
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            clauses.append('timestamp < ?')
+            params.append(end + '~')
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, job_type=None, user=None, start=None, end=None, limit=None, offset=0):
+        """Return history records newest first, optionally filtered by job type, user and timestamp range."""
+        where, params = self._where(job_type, user, start, end)
+        sql = 'SELECT timestamp, job_type, csv_path, user FROM history' + where + ' ORDER BY timestamp DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [limit, offset]
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    def page(self, before=None, limit=25, **filters):
+        """Keyset-paginated records, newest first. before is the (timestamp, id) cursor returned for the previous page."""
+        where, params = self._where(**filters)
+        if before:
+            where += (' AND ' if where else ' WHERE ') + '(timestamp, id) < (?, ?)'
+            params += list(before)
+        sql = 'SELECT id, timestamp, job_type, csv_path, user FROM history' + where + ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = [dict(row) for row in self._reader().execute(sql, params)]
+        next_before = (rows[limit - 1]['timestamp'], rows[limit - 1]['id']) if len(rows) > limit else None
+        return rows[:limit], next_before
+
+    def last_id(self):
+        return self._reader().execute('SELECT MAX(id) FROM history').fetchone()[0]
+
+    def count(self, job_type=None, user=None, start=None, end=None):
+        where, params = self._where(job_type, user, start, end)
+        return self._reader().execute('SELECT COUNT(*) FROM history' + where, params).fetchone()[0]
+
+    def put_job(self, record):
+        self._write('job', record['id'], json.dumps(record))
+
+    def get_job(self, job_id):
+        row = self._reader().execute('SELECT record FROM parse_jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row['record']) if row else None
+
+    def delete_jobs(self, job_ids):
+        self._write('delete_jobs', list(job_ids))
+
+    @staticmethod
+    def index_key(value):
+        return ''.join(str(value).split()).upper()
+
+    def index_rows(self, csv_path, job_type, timestamp, rows):
+        """Index one history CSV. rows yields (REG NUMBER, VIN, YOUR REF NO) per data row; a file is only indexed once."""
+        entries = []
+        for row_number, values in enumerate(rows, 1):
+            keys = set()
+            for field, value in zip(self.INDEX_FIELDS, values):
+                key = self.index_key(value or '')
+                # GR11 rows repeat the reg as YOUR REF NO; one entry per key keeps the row from showing up twice
+                if key and key != 'NAN' and key not in keys:
+                    keys.add(key)
+                    entries.append((key, field, csv_path, row_number, job_type, timestamp))
+        self._write('index', csv_path, entries)
+
+    def index_history_dir(self, history_dir, prefix='history/', settle=60):
+        """Index history CSVs exported before the lookup index existed. Returns the number of files indexed.
+
+        Files with no history record that changed in the last settle seconds may still be being written, so they are left
+        for the export that is writing them.
+        """
+        reader = self._reader()
+        done = {row[0] for row in reader.execute('SELECT csv_path FROM indexed_files')}
+        known = {row['csv_path']: row for row in reader.execute('SELECT csv_path, job_type, timestamp FROM history')}
+        indexed = 0
+        for name in sorted(os.listdir(history_dir)):
+            csv_path = prefix + name
+            if not name.endswith('.csv') or csv_path in done:
+                continue
+            record = known.get(csv_path)
+            path = os.path.join(history_dir, name)
+            if not record and os.path.getmtime(path) > time.time() - settle:
+                continue
+            # Files are named history_<job type>_<YYYYMMDD_HHMMSS>[_part][_n].csv
+            parts = name[:-len('.csv')].split('_')
+            job_type = record['job_type'] if record else (parts[1] if len(parts) > 1 else None)
+            timestamp = record['timestamp'] if record else '_'.join(parts[2:4]) or None
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                reader = csv.DictReader(f)
+                self.index_rows(csv_path, job_type, timestamp, ([row.get(field) for field in self.INDEX_FIELDS] for row in reader))
+            indexed += 1
+        return indexed
+
+    def search(self, prefix, limit=50):
+        """Index entries whose REG NUMBER, VIN or YOUR REF NO starts with prefix (ignoring case and spaces), exact matches first.
+
+        Each CSV row is returned once, under the first of its fields that matched.
+        """
+        key = self.index_key(prefix)
+        if not key:
+            return []
+        upper = key[:-1] + chr(ord(key[-1]) + 1)
+        results, seen = [], set()
+        rows = self._reader().execute(
+            'SELECT key, field, csv_path, row, job_type, timestamp FROM job_index WHERE key >= ? AND key < ? '
+            'ORDER BY key, timestamp DESC', (key, upper)
+        )
+        try:
+            for row in rows:
+                if (row['csv_path'], row['row']) in seen:
+                    continue
+                seen.add((row['csv_path'], row['row']))
+                results.append(dict(row))
+                if len(results) >= limit:
+                    break
+        finally:
+            # End the read so WAL checkpoints are not held back by a half-read statement
+            rows.close()
+        return results
+
+    def close(self, timeout=None):
+        """Commit everything still queued, stop the writer and close the connection.
+
+        Returns False if the writer was still busy when timeout ran out, or had dropped writes.
+        """
+        if self.writer is not None:
+            self.pending.put(None)
+            self.writer.join(timeout)
+            if self.writer.is_alive():
+                return False
+        with self.lock:
+            self.conn.close()
+        with self.readers_lock:
+            for reader in self.readers:
+                reader.close()
+            self.readers = []
+        return not self.dropped
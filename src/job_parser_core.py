@@ -1,10 +1,270 @@
+import csv
+import glob
+import io
+import os
 import re
-from datetime import datetime, timedelta
-import holidays
+import sys
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
+from operator import attrgetter
+
+from reference_data import ReferenceData
+
+# Precompiled patterns shared by JobParser and BC04Parser
+POSTCODE_RE = re.compile(r'^(?:(?:Postcode|Post Code|P/Code|PC)[\s:]+)?([A-Za-z]{1,2}[0-9][0-9A-Za-z]?\s*[0-9][A-Za-z]{2})$')
+BC04_POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})\b')
+POSTCODE_SPACING_RE = re.compile(r'([A-Z]\d+[A-Z]?)(\d[A-Z]{2})')
+PHONE_RE = re.compile(r'(?:Tel|Phone|T|Telephone)[\s:.]+([+\d()\s-]+)', re.IGNORECASE)
+PHONE_PREFIX_RE = re.compile(r'^(Tel|Phone|T|Telephone)[\s:.]*', re.IGNORECASE)
+PHONE_JUNK_RE = re.compile(r'[^\d+\s()-]')
+WHITESPACE_RE = re.compile(r'\s+')
+PHONE_DIGITS_RE = re.compile(r'\d{8,}')
+DATE_RE = re.compile(r'\d{2}/\d{2}/\d{4}')
+FROM_BLOCK_RE = re.compile(r'FROM\n(.*?)(?=\nTO|$)', re.DOTALL)
+JOB_NUMBER_RE = re.compile(r'Job Number.*?(\d+/\d+)', re.DOTALL)
+REG_RE = re.compile(r'([A-Z]{2}\d{2}[A-Z]{3})')
+REG_VIN_RE = re.compile(r'([A-Z]{2}\d{2}[A-Z]{3})\s+(\d{9,})')
+REG_LINE_RE = re.compile(r'^[A-Z]{2}\d{2}[A-Z]{3}\s+\d{9,}')
+PRICE_RE = re.compile(r'┬ú?\s*(\d+\.\d{2})')
+ADDRESS_PRESERVE_PATTERNS = [
+    (re.compile(r'St\.\s+[A-Z][a-z]+'), lambda m: m.group().replace('.', '@')),
+    (re.compile(r'St\s+[A-Z][a-z]+'), lambda m: m.group().replace(' ', '#')),
+    (re.compile(r'D\.\s*M\.\s*Keith'), lambda m: m.group().replace('.', '@')),
+    (re.compile(r'[A-Z]\.\s+[A-Z]\.\s+\w+'), lambda m: m.group().replace('.', '@')),
+]
+
+def find_vin(job_text, reg):
+    """Return the VIN that follows reg in the job text."""
+    for match in REG_VIN_RE.finditer(job_text):
+        if match.group(1) == reg:
+            return match.group(2)
+    return ''
+
+def iter_lines(text_or_file):
+    """Yield newline-terminated lines from a string or an open text/binary file."""
+    if isinstance(text_or_file, str):
+        start = 0
+        while start < len(text_or_file):
+            end = text_or_file.find('\n', start)
+            if end == -1:
+                yield text_or_file[start:]
+                return
+            yield text_or_file[start:end + 1]
+            start = end + 1
+        return
+    for line in text_or_file:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.endswith('\r\n'):
+            line = line[:-2] + '\n'
+        yield line
+
+class BusinessDayCalendar:
+    """UK working days (weekdays that are not bank holidays) precomputed for a range of years.
+
+    The table grows to cover dates up to max_span years either side of today; dates beyond that are
+    stepped one day at a time so a far-off date cannot make it rebuild or grow without bound.
+    """
+    def __init__(self, first_year=None, last_year=None, cache_size=4096, max_span=20):
+        this_year = datetime.now().year
+        self.first_year = first_year or this_year - 1
+        self.last_year = last_year or this_year + 5
+        self.min_year = min(self.first_year, this_year - max_span)
+        self.max_year = max(self.last_year, this_year + max_span)
+        # (first_year, last_year, working day ordinals), swapped as a whole so readers never see it half-built
+        self.table = None
+        self.lock = threading.Lock()
+        self.add_business_days = lru_cache(maxsize=cache_size)(self._add_business_days)
+
+    def _build(self, first_year, last_year):
+        # Imported here so the holiday tables only load when a delivery date is first needed
+        import holidays
+        uk_holidays = holidays.UK(years=range(first_year, last_year + 1))
+        start = date(first_year, 1, 1).toordinal()
+        end = date(last_year, 12, 31).toordinal()
+        working_days = []
+        for ordinal in range(start, end + 1):
+            day = date.fromordinal(ordinal)
+            if day.weekday() < 5 and day not in uk_holidays:
+                working_days.append(ordinal)
+        return working_days
+
+    def _table(self, year):
+        """Return a table covering year and the year after, building it once if needed."""
+        table = self.table
+        if table and table[0] <= year < table[1]:
+            return table
+        with self.lock:
+            table = self.table
+            if not table or not table[0] <= year < table[1]:
+                first_year = min(table[0] if table else self.first_year, year)
+                last_year = max(table[1] if table else self.last_year, year + 1)
+                table = self.table = (first_year, last_year, self._build(first_year, last_year))
+        return table
+
+    def _step_business_days(self, day, n):
+        import holidays
+        uk_holidays = holidays.UK()
+        while n:
+            day += timedelta(days=1)
+            if day.weekday() < 5 and day not in uk_holidays:
+                n -= 1
+        return day
+
+    def _add_business_days(self, day, n):
+        """Return the nth working day after day, keeping day's type (date or datetime)."""
+        if n <= 0:
+            return day
+        if not self.min_year <= day.year < self.max_year:
+            return self._step_business_days(day, n)
+        working_days = self._table(day.year)[2]
+        ordinal = day.toordinal()
+        idx = bisect_right(working_days, ordinal) + n - 1
+        if idx >= len(working_days):
+            return self._step_business_days(day, n)
+        return day + timedelta(days=working_days[idx] - ordinal)
+
+uk_calendar = BusinessDayCalendar()
+
+# Vehicle makes, location renames and spreadsheet column aliases, reloaded when the file changes
+REFERENCE_DATA = os.environ.get('REFERENCE_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference_data.json'))
+reference_data = ReferenceData(REFERENCE_DATA, check_interval=int(os.environ.get('REFERENCE_CHECK_INTERVAL', 5)))
+
+JOB_FIELDS = (
+    'REG NUMBER', 'VIN', 'MAKE', 'MODEL', 'COLOR', 'COLLECTION DATE', 'YOUR REF NO', 'COLLECTION ADDR1',
+    'COLLECTION ADDR2', 'COLLECTION ADDR3', 'COLLECTION ADDR4', 'COLLECTION POSTCODE',
+    'COLLECTION CONTACT NAME', 'COLLECTION PHONE', 'DELIVERY DATE', 'DELIVERY ADDR1', 'DELIVERY ADDR2',
+    'DELIVERY ADDR3', 'DELIVERY ADDR4', 'DELIVERY POSTCODE', 'DELIVERY CONTACT NAME',
+    'DELIVERY CONTACT PHONE', 'SPECIAL INSTRUCTIONS', 'PRICE', 'CUSTOMER REF', 'TRANSPORT TYPE'
+)
+JOB_ATTRS = tuple(field.lower().replace(' ', '_') for field in JOB_FIELDS)
+FIELD_ATTRS = dict(zip(JOB_FIELDS, JOB_ATTRS))
+
+@lru_cache(maxsize=None)
+def row_getter(fields):
+    """attrgetter that pulls the given CSV columns off a Job as a tuple."""
+    getter = attrgetter(*(FIELD_ATTRS[field] for field in fields))
+    if len(fields) == 1:
+        return lambda job: (getter(job),)
+    return getter
+
+class Job:
+    """One parsed job. Slots are the CSV columns in JOB_FIELDS order, snake_cased; item access by column name still works."""
+    __slots__ = JOB_ATTRS
+
+    def __init__(self, customer_ref='', collection_date='', delivery_date='', special_instructions=''):
+        self.reg_number = ''
+        self.vin = ''
+        self.make = ''
+        self.model = ''
+        self.color = ''
+        self.collection_date = collection_date
+        self.your_ref_no = ''
+        self.collection_addr1 = ''
+        self.collection_addr2 = ''
+        self.collection_addr3 = ''
+        self.collection_addr4 = ''
+        self.collection_postcode = ''
+        self.collection_contact_name = ''
+        self.collection_phone = ''
+        self.delivery_date = delivery_date
+        self.delivery_addr1 = ''
+        self.delivery_addr2 = ''
+        self.delivery_addr3 = ''
+        self.delivery_addr4 = ''
+        self.delivery_postcode = ''
+        self.delivery_contact_name = ''
+        self.delivery_contact_phone = ''
+        self.special_instructions = special_instructions
+        self.price = ''
+        self.customer_ref = customer_ref
+        self.transport_type = ''
+
+    @classmethod
+    def from_row(cls, row):
+        job = cls.__new__(cls)
+        for name, value in zip(JOB_ATTRS, row):
+            setattr(job, name, value)
+        return job
+
+    def to_row(self, fields=JOB_FIELDS):
+        return row_getter(tuple(fields))(self)
+
+    def to_dict(self, fields=JOB_FIELDS):
+        return dict(zip(fields, self.to_row(fields)))
+
+    def keys(self):
+        return list(JOB_FIELDS)
+
+    def get(self, field, default=None):
+        return getattr(self, FIELD_ATTRS[field]) if field in FIELD_ATTRS else default
+
+    def __getitem__(self, field):
+        return getattr(self, FIELD_ATTRS[field])
+
+    def __setitem__(self, field, value):
+        setattr(self, FIELD_ATTRS[field], value)
+
+    def __contains__(self, field):
+        return field in FIELD_ATTRS
+
+    def __eq__(self, other):
+        return isinstance(other, Job) and self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f'Job({self.to_dict()!r})'
+
+# Pastes shorter than this many characters are parsed serially by parse_jobs_parallel
+PARALLEL_THRESHOLD = int(os.environ.get('PARALLEL_THRESHOLD', 2 * 1024 * 1024))
+JOB_TYPES = ('AC01', 'BC04', 'EU01', 'GR11', 'CW09')
+SPREADSHEET_EXTENSIONS = ('.xlsx', '.csv')
+XLS_ERROR = 'Old .xls workbooks are not supported; save the sheet as .xlsx or CSV.'
+DELIVERY_BUSINESS_DAYS = {'AC01': 3, 'BC04': 1}
+
+def default_delivery_date(job_type, collection_date):
+    """dd/mm/yyyy delivery date for a dd/mm/yyyy collection: 3 business days on for AC01, 1 for BC04, same day otherwise."""
+    days = DELIVERY_BUSINESS_DAYS.get(job_type)
+    if not days:
+        return collection_date
+    return uk_calendar.add_business_days(datetime.strptime(collection_date, '%d/%m/%Y'), days).strftime('%d/%m/%Y')
+
+def process_pool(workers):
+    """ProcessPoolExecutor whose children start clean (forkserver, or spawn where that is missing).
+
+    Forking a web worker that is running writer, bcrypt and parse threads can copy a lock another thread holds
+    into the child, which then deadlocks on it.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+def _parse_job_batch(parser_class, collection_date, delivery_date, job_texts):
+    parser = parser_class(collection_date, delivery_date)
+    return [job for job in map(parser.parse_job_text, job_texts) if job]
+
+def parse_in_processes(parser, text, workers=None):
+    """Split text at job boundaries, parse the batches in a process pool and return the jobs in input order."""
+    workers = workers or os.cpu_count() or 1
+    job_texts = list(parser.iter_job_texts(text))
+    if not job_texts:
+        return []
+    batch_size = -(-len(job_texts) // (workers * 4))
+    batches = [job_texts[i:i + batch_size] for i in range(0, len(job_texts), batch_size)]
+    jobs = []
+    parse_batch = partial(_parse_job_batch, type(parser), parser.collection_date, parser.delivery_date)
+    with process_pool(min(workers, len(batches))) as executor:
+        for batch_jobs in executor.map(parse_batch, batches):
+            jobs.extend(batch_jobs)
+    parser.rejected += len(job_texts) - len(jobs)
+    return jobs
 
 class JobParser:
     def __init__(self, collection_date, delivery_date=None):
         self.jobs = []
+        self.rejected = 0
         self.collection_date = collection_date
         self.delivery_date = delivery_date if delivery_date else collection_date
         
@@ -12,24 +272,11 @@ class JobParser:
         """Calculate delivery date as 3 business days from collection date."""
         if isinstance(collection_date, str):
             collection_date = datetime.strptime(collection_date, "%d/%m/%Y")
-        uk_holidays = holidays.UK()
-        current_date = collection_date
-        business_days = 0
-        while business_days < 3:
-            current_date += timedelta(days=1)
-            if current_date.weekday() < 5 and current_date not in uk_holidays:
-                business_days += 1
-        return current_date.strftime("%d/%m/%Y")
+        return uk_calendar.add_business_days(collection_date, 3).strftime("%d/%m/%Y")
     
     def fix_location_name(self, name):
-        name = name.replace('18 AC Stoke Logistics Hub', '18 Arnold Clark Stoke Logistics Hub')
-        name = name.replace('4 AC Accrington Logistics Hub', '4 Arnold Clark Accrington Logistics Hub')
-        if "Unit 1 Calder Park Services" in name:
-            return "Wakefield Motorstore"
-        if name.startswith("Unit ") and len(name.split()) >= 3:
-            pass
-        return name
-    
+        return reference_data.current().rename_location(name)
+
     def clean_phone_number(self, phone):
         if not phone:
             return ""
@@ -47,48 +294,75 @@ class JobParser:
         return digits
 
     def is_postcode(self, line):
-        postcode_patterns = [
-            r'^[A-Z]{1,2}[0-9][0-9A-Z]?\s*[0-9][A-Z]{2}$',
-            r'^[A-Za-z]{1,2}[0-9][0-9A-Za-z]?\s*[0-9][A-Za-z]{2}$',
-            r'^(?:Postcode|Post Code|P/Code|PC)[\s:]+[A-Za-z]{1,2}[0-9][0-9A-Za-z]?\s*[0-9][A-Za-z]{2}$'
-        ]
-        line = line.strip()
-        for pattern in postcode_patterns:
-            if re.match(pattern, line):
-                postcode_match = re.search(r'([A-Za-z]{1,2}[0-9][0-9A-Za-z]?\s*[0-9][A-Za-z]{2})$', line)
-                if postcode_match:
-                    return postcode_match.group(1).upper()
+        match = POSTCODE_RE.match(line.strip())
+        if match:
+            return match.group(1).upper()
         return None
 
-    def parse_jobs(self, text):
-        job_texts = re.split(r'\nFROM\n', text)
-        job_texts = [t for t in job_texts if t.strip()]
-        for job_text in job_texts:
-            if not job_text.startswith('FROM'):
-                job_text = 'FROM\n' + job_text
-            if not re.search(r'TO\n', job_text):
-                continue
-            job = self.parse_single_job(job_text)
+    def iter_job_texts(self, text_or_file):
+        """Yield the text of each FROM/TO block, walking the input once."""
+        block = []
+        after_split = False
+        for i, line in enumerate(iter_lines(text_or_file)):
+            # A FROM line splits jobs unless it opens the input or directly follows another split
+            if line == 'FROM\n' and i > 0 and not after_split:
+                block[-1] = block[-1][:-1]
+                job_text = self._block_text(block)
+                if job_text:
+                    yield job_text
+                block = []
+                after_split = True
+            else:
+                block.append(line)
+                after_split = False
+        job_text = self._block_text(block)
+        if job_text:
+            yield job_text
+
+    def _block_text(self, block):
+        if not any(line.strip() for line in block):
+            return None
+        if not block[0].startswith('FROM'):
+            block.insert(0, 'FROM\n')
+        job_text = ''.join(block)
+        if 'TO\n' not in job_text:
+            return None
+        return job_text
+
+    def parse_job_text(self, job_text):
+        job = self.parse_single_job(job_text)
+        if job:
+            if not job.special_instructions:
+                job.special_instructions = 'Please call 1 hour before collection'
+            return job
+        return None
+
+    def iter_jobs(self, text_or_file):
+        for job_text in self.iter_job_texts(text_or_file):
+            job = self.parse_job_text(job_text)
             if job:
-                if 'SPECIAL INSTRUCTIONS' not in job or not job['SPECIAL INSTRUCTIONS']:
-                    job['SPECIAL INSTRUCTIONS'] = 'Please call 1 hour before collection'
-                self.jobs.append(job)
+                yield job
+            else:
+                self.rejected += 1
+
+    def parse_jobs(self, text):
+        self.jobs.extend(self.iter_jobs(text))
+        return self.jobs
+
+    def parse_jobs_parallel(self, text, workers=None, threshold=PARALLEL_THRESHOLD):
+        if len(text) < threshold:
+            return self.parse_jobs(text)
+        self.jobs.extend(parse_in_processes(self, text, workers))
         return self.jobs
     
     def parse_address_lines(self, lines):
-        preserved_patterns = [
-            (r'St\.\s+[A-Z][a-z]+', lambda m: m.group().replace('.', '@')),
-            (r'St\s+[A-Z][a-z]+', lambda m: m.group().replace(' ', '#')),
-            (r'D\.\s*M\.\s*Keith', lambda m: m.group().replace('.', '@')),
-            (r'[A-Z]\.\s+[A-Z]\.\s+\w+', lambda m: m.group().replace('.', '@')),
-        ]
         processed_lines = []
         for line in lines:
             if not line.strip():
                 continue
             processed_line = line
-            for pattern, replacement in preserved_patterns:
-                processed_line = re.sub(pattern, replacement, processed_line)
+            for pattern, replacement in ADDRESS_PRESERVE_PATTERNS:
+                processed_line = pattern.sub(replacement, processed_line)
             processed_line = processed_line.replace('@', '.').replace('#', ' ')
             processed_lines.append(processed_line.strip())
         return processed_lines
@@ -107,147 +381,106 @@ class JobParser:
         return cleaned_lines
 
     def parse_single_job(self, job_text):
-        job = {}
-        job['REG NUMBER'] = ''
-        job['VIN'] = ''
-        job['MAKE'] = ''
-        job['MODEL'] = ''
-        job['COLOR'] = ''
-        job['COLLECTION DATE'] = self.collection_date
-        job['YOUR REF NO'] = ''
-        job['COLLECTION ADDR1'] = ''
-        job['COLLECTION ADDR2'] = ''
-        job['COLLECTION ADDR3'] = ''
-        job['COLLECTION ADDR4'] = ''
-        job['COLLECTION POSTCODE'] = ''
-        job['COLLECTION CONTACT NAME'] = ''
-        job['COLLECTION PHONE'] = ''
-        job['DELIVERY DATE'] = self.delivery_date
-        job['DELIVERY ADDR1'] = ''
-        job['DELIVERY ADDR2'] = ''
-        job['DELIVERY ADDR3'] = ''
-        job['DELIVERY ADDR4'] = ''
-        job['DELIVERY POSTCODE'] = ''
-        job['DELIVERY CONTACT NAME'] = ''
-        job['DELIVERY CONTACT PHONE'] = ''
-        job['SPECIAL INSTRUCTIONS'] = 'Must call 1hour before collection and get a name'
-        job['PRICE'] = ''
-        job['CUSTOMER REF'] = 'AC01'
-        job['TRANSPORT TYPE'] = ''
-        from_match = re.search(r'FROM\n(.*?)(?=\nTO|$)', job_text, re.DOTALL)
+        job = Job('AC01', self.collection_date, self.delivery_date, 'Must call 1hour before collection and get a name')
+        from_match = FROM_BLOCK_RE.search(job_text)
         if from_match:
             from_text = from_match.group(1).strip()
             from_lines = [line.strip() for line in from_text.split('\n') if line.strip()]
-            phone_lines = [line for line in from_lines if re.search(r'(?:Tel|Phone|T|Telephone)[\s:.]+[+\d()\s-]+', line, re.IGNORECASE)]
-            if phone_lines:
-                phone_match = re.search(r'(?:Tel|Phone|T|Telephone)[\s:.]+([+\d()\s-]+)', phone_lines[0], re.IGNORECASE)
+            for line in from_lines:
+                phone_match = PHONE_RE.search(line)
                 if phone_match:
-                    job['COLLECTION PHONE'] = self.clean_phone_number(phone_match.group(1))
+                    job.collection_phone = self.clean_phone_number(phone_match.group(1))
+                    break
         # ... (rest of parse_single_job logic as in your original)
         return job
 
 class BC04Parser:
     def __init__(self, collection_date, delivery_date=None):
         self.jobs = []
+        self.rejected = 0
         self.collection_date = collection_date
         self.delivery_date = delivery_date if delivery_date else collection_date
         self.bc04_special_instructions = (
             "MUST GET A FULL NAME AND SIGNATURE ON COLLECTION CALL OFFICE AND Non Conformance Motability on 0121 788 6940 option 1 IF THEY REFUSE ** - PHOTO'S MUST BE CLEAR PLEASE. COLL AND DEL 09:00-17:00 ONLY"
         )
     def calculate_delivery_date(self, collection_date):
-        try:
-            import holidays
-            uk_holidays = holidays.UnitedKingdom()
-        except ImportError:
-            class DummyHolidays:
-                def __init__(self, *args, **kwargs):
-                    pass
-                def __contains__(self, date):
-                    return False
-            uk_holidays = DummyHolidays()
-        delivery = collection_date
-        delivery += timedelta(days=1)
-        while delivery.weekday() >= 5 or delivery in uk_holidays:
-            delivery += timedelta(days=1)
-        return delivery
+        return uk_calendar.add_business_days(collection_date, 1)
     def clean_phone_number(self, phone):
         if not phone:
             return ''
         phone = phone.strip()
-        phone = re.sub(r'^(Tel|Phone|T|Telephone)[\s:.]*', '', phone, flags=re.IGNORECASE)
-        phone = re.sub(r'[^\d+\s()-]', '', phone)
-        phone = re.sub(r'\s+', ' ', phone).strip()
+        phone = PHONE_PREFIX_RE.sub('', phone)
+        phone = PHONE_JUNK_RE.sub('', phone)
+        phone = WHITESPACE_RE.sub(' ', phone).strip()
         return phone
     def is_postcode(self, line):
-        postcode_pattern = r'\b([A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})\b'
-        match = re.search(postcode_pattern, line.upper())
+        match = BC04_POSTCODE_RE.search(line.upper())
         if match:
             postcode = match.group(1)
-            postcode = re.sub(r'([A-Z]\d+[A-Z]?)(\d[A-Z]{2})', r'\1 \2', postcode)
+            postcode = POSTCODE_SPACING_RE.sub(r'\1 \2', postcode)
             return postcode
         return None
+    def iter_job_texts(self, text_or_file):
+        """Yield the stripped text of each Job Sheet section, walking the input once."""
+        block = []
+        for line in iter_lines(text_or_file):
+            head = line.rstrip()
+            if line.endswith('\n') and head.endswith('Job Sheet'):
+                block.append(head[:-len('Job Sheet')])
+                section = ''.join(block).strip()
+                if section:
+                    yield section
+                block = []
+            else:
+                block.append(line)
+        section = ''.join(block).strip()
+        if section:
+            yield section
+
+    def parse_job_text(self, job_text):
+        job = self.parse_single_job(job_text)
+        if job and job.reg_number:
+            return job
+        return None
+
+    def iter_jobs(self, text_or_file):
+        for section in self.iter_job_texts(text_or_file):
+            job = self.parse_job_text(section)
+            if job:
+                yield job
+            else:
+                self.rejected += 1
+
     def parse_jobs(self, text):
-        self.jobs = []
-        job_sections = re.split(r'Job Sheet\s*\n', text)
-        job_sections = [section.strip() for section in job_sections if section.strip()]
-        for section in job_sections:
-            if section.strip():
-                job = self.parse_single_job(section)
-                if job and job.get('REG NUMBER'):
-                    self.jobs.append(job)
+        self.jobs = list(self.iter_jobs(text))
+        return self.jobs
+
+    def parse_jobs_parallel(self, text, workers=None, threshold=PARALLEL_THRESHOLD):
+        if len(text) < threshold:
+            return self.parse_jobs(text)
+        self.jobs = parse_in_processes(self, text, workers)
         return self.jobs
     def parse_single_job(self, job_text):
-        job = {}
-        job['REG NUMBER'] = ''
-        job['VIN'] = ''
-        job['MAKE'] = ''
-        job['MODEL'] = ''
-        job['COLOR'] = ''
-        job['COLLECTION DATE'] = self.collection_date
-        job['YOUR REF NO'] = ''
-        job['COLLECTION ADDR1'] = ''
-        job['COLLECTION ADDR2'] = ''
-        job['COLLECTION ADDR3'] = ''
-        job['COLLECTION ADDR4'] = ''
-        job['COLLECTION POSTCODE'] = ''
-        job['COLLECTION CONTACT NAME'] = ''
-        job['COLLECTION PHONE'] = ''
-        job['DELIVERY DATE'] = self.delivery_date
-        job['DELIVERY ADDR1'] = ''
-        job['DELIVERY ADDR2'] = ''
-        job['DELIVERY ADDR3'] = ''
-        job['DELIVERY ADDR4'] = ''
-        job['DELIVERY POSTCODE'] = ''
-        job['DELIVERY CONTACT NAME'] = ''
-        job['DELIVERY CONTACT PHONE'] = ''
-        job['SPECIAL INSTRUCTIONS'] = self.bc04_special_instructions
-        job['PRICE'] = ''
-        job['CUSTOMER REF'] = 'BC04'
-        job['TRANSPORT TYPE'] = ''
-        job_number_match = re.search(r'Job Number.*?(\d+/\d+)', job_text, re.DOTALL)
+        job = Job('BC04', self.collection_date, self.delivery_date, self.bc04_special_instructions)
+        job_number_match = JOB_NUMBER_RE.search(job_text)
         if job_number_match:
-            job['YOUR REF NO'] = job_number_match.group(1)
-        reg_match = re.search(r'([A-Z]{2}\d{2}[A-Z]{3})', job_text)
+            job.your_ref_no = job_number_match.group(1)
+        reg_match = REG_RE.search(job_text)
         if reg_match:
-            job['REG NUMBER'] = reg_match.group(1)
-        vin_match = re.search(rf'{job["REG NUMBER"]}\s+(\d{{9,}})', job_text) if job['REG NUMBER'] else None
-        if vin_match:
-            job['VIN'] = vin_match.group(1)
-        job['MAKE'] = ''
-        job['MODEL'] = ''
-        price_matches = re.findall(r'┬ú?\s*(\d+\.\d{2})', job_text)
+            job.reg_number = reg_match.group(1)
+            job.vin = find_vin(job_text, job.reg_number)
+        price_matches = PRICE_RE.findall(job_text)
         if len(price_matches) >= 2:
-            job['PRICE'] = price_matches[1]
+            job.price = price_matches[1]
         elif price_matches:
-            job['PRICE'] = price_matches[0]
+            job.price = price_matches[0]
         lines = [line.strip() for line in job_text.split('\n')]
         addr_start = None
         reg_line_idx = None
-        reg_pattern = r'^[A-Z]{2}\d{2}[A-Z]{3}\s+\d{9,}'
         for i, line in enumerate(lines):
             if line.strip().lower().startswith('special instructions'):
                 addr_start = i + 1
-            if re.match(reg_pattern, line.strip()):
+            if REG_LINE_RE.match(line.strip()):
                 reg_line_idx = i
                 break
         if addr_start is not None and reg_line_idx is not None and addr_start < reg_line_idx:
@@ -269,13 +502,13 @@ class BC04Parser:
                     c_addr = collection_lines[:c_postcode_idx]
                     c_town = c_addr[-1] if len(c_addr) >= 1 else ''
                     for i in range(3):
-                        job[f'COLLECTION ADDR{i+1}'] = c_addr[i] if i < len(c_addr)-1 else ''
-                    job['COLLECTION ADDR4'] = c_town
-                    job['COLLECTION POSTCODE'] = collection_lines[c_postcode_idx]
+                        setattr(job, f'collection_addr{i+1}', c_addr[i] if i < len(c_addr)-1 else '')
+                    job.collection_addr4 = c_town
+                    job.collection_postcode = collection_lines[c_postcode_idx]
                 else:
                     for idx, val in enumerate(collection_lines):
                         if idx < 4:
-                            job[f'COLLECTION ADDR{idx+1}'] = val
+                            setattr(job, f'collection_addr{idx+1}', val)
             if delivery_lines:
                 d_postcode_idx = None
                 for idx, l in enumerate(delivery_lines):
@@ -286,24 +519,282 @@ class BC04Parser:
                     d_addr = delivery_lines[:d_postcode_idx]
                     d_town = d_addr[-1] if len(d_addr) >= 1 else ''
                     for i in range(3):
-                        job[f'DELIVERY ADDR{i+1}'] = d_addr[i] if i < len(d_addr)-1 else ''
-                    job['DELIVERY ADDR4'] = d_town
-                    job['DELIVERY POSTCODE'] = delivery_lines[d_postcode_idx]
+                        setattr(job, f'delivery_addr{i+1}', d_addr[i] if i < len(d_addr)-1 else '')
+                    job.delivery_addr4 = d_town
+                    job.delivery_postcode = delivery_lines[d_postcode_idx]
                 else:
                     for idx, val in enumerate(delivery_lines):
                         if idx < 4:
-                            job[f'DELIVERY ADDR{idx+1}'] = val
+                            setattr(job, f'delivery_addr{idx+1}', val)
         phone_line = ''
         found_dates = False
         for i, line in enumerate(lines):
-            phones = re.findall(r'\d{8,}', line)
+            phones = PHONE_DIGITS_RE.findall(line)
             if len(phones) >= 2:
-                if i+1 < len(lines) and re.match(r'\d{2}/\d{2}/\d{4}', lines[i+1]):
-                    job['COLLECTION PHONE'] = phones[0]
-                    job['DELIVERY CONTACT PHONE'] = phones[1]
+                if i+1 < len(lines) and DATE_RE.match(lines[i+1]):
+                    job.collection_phone = phones[0]
+                    job.delivery_contact_phone = phones[1]
                     date_matches = []
                     for l in lines[i+1:i+5]:
-                        date_matches += re.findall(r'\d{2}/\d{2}/\d{4}', l)
+                        date_matches += DATE_RE.findall(l)
                         if len(date_matches) >= 2:
                             break
-        return job 
\ No newline at end of file
+        return job 
+
+# GR11/CW09 exports leave out the colour and contact columns
+GR11_FIELDNAMES = [field for field in JOB_FIELDS if field not in (
+    'COLOR', 'COLLECTION CONTACT NAME', 'COLLECTION PHONE', 'DELIVERY CONTACT NAME', 'DELIVERY CONTACT PHONE'
+)]
+# Workbooks bigger than this are streamed row by row instead of loaded through pandas
+XLSX_STREAM_THRESHOLD = int(os.environ.get('XLSX_STREAM_THRESHOLD', 5 * 1024 * 1024))
+GR11_COLLECTION = {
+    'COLLECTION ADDR1': 'Greenhous High Ercall',
+    'COLLECTION ADDR2': 'Greenhous Village Osbaston',
+    'COLLECTION ADDR3': 'High Ercall',
+    'COLLECTION ADDR4': '',
+    'COLLECTION POSTCODE': 'TF6 6RA',
+}
+GR15_COLLECTION = {
+    'COLLECTION ADDR1': 'Greenhous Upper Heyford',
+    'COLLECTION ADDR2': 'Heyford Park, Bicester',
+    'COLLECTION ADDR3': 'Bicester',
+    'COLLECTION ADDR4': 'UPPER HEYFORD',
+    'COLLECTION POSTCODE': 'OX25 5HA',
+}
+ADDRESS_SPLIT_PATTERN = r'\s*[,\n][\s,]*'
+ADDRESS_TRIM_PATTERN = r'^[\s,]+|[\s,]+$'
+GR11_POSTCODE_PATTERN = r'\b([A-Z]{1,2}\d{1,2}[A-Z]? ?\d[A-Z]{2})\b'
+
+class SpreadsheetParser:
+    """Vectorized conversion of GR11/CW09 dealer spreadsheets into job rows."""
+    def __init__(self, job_type='GR11'):
+        self.job_type = job_type
+
+    def read(self, file):
+        """Load only the columns named in the reference column aliases, as strings with blank cells as ''."""
+        import pandas as pd
+        filename = file.filename.lower()
+        if filename.endswith('.xls'):
+            raise ValueError(XLS_ERROR)
+        if not filename.endswith('.xlsx'):
+            return pd.read_csv(file, usecols=self.is_wanted_column, dtype=str, na_filter=False)
+        size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+        if size > XLSX_STREAM_THRESHOLD:
+            return self.stream_xlsx(file)
+        return pd.read_excel(file, usecols=self.is_wanted_column, dtype=str).fillna('')
+
+    def stream_xlsx(self, file):
+        """Read the first sheet through a read-only openpyxl iterator, keeping only the wanted columns."""
+        import pandas as pd
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, ())
+            keep = [i for i, col in enumerate(header) if col is not None and self.is_wanted_column(col)]
+            records = []
+            for row in rows:
+                values = [self.cell_text(row[i]) if i < len(row) else '' for i in keep]
+                if any(values):
+                    records.append(values)
+        finally:
+            workbook.close()
+        return pd.DataFrame(records, columns=[str(header[i]) for i in keep], dtype=object)
+
+    @staticmethod
+    def cell_text(value):
+        if value is None:
+            return ''
+        # Match pandas, which reads whole-number cells as ints
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+
+    def is_wanted_column(self, col):
+        return str(col).strip().lower() in reference_data.current().alias_keys
+
+    def map_columns(self, columns):
+        alias_keys = reference_data.current().alias_keys
+        colmap = {}
+        for col in columns:
+            key = alias_keys.get(str(col).strip().lower())
+            if key:
+                colmap[key] = col
+        return colmap
+
+    def parse_dataframe(self, df):
+        import numpy as np
+        import pandas as pd
+        tables = reference_data.current()
+        colmap = self.map_columns(df.columns)
+
+        def column(key):
+            if key not in colmap:
+                return pd.Series('', index=df.index, dtype=object)
+            return df[colmap[key]].map(str).str.strip()
+
+        reg = column('reg')
+        has_reg = reg != ''
+        df = df[has_reg]
+        reg = reg[has_reg]
+        vin = column('chassis')
+        model = column('model')
+        make = model.str.extract(tables.make_pattern, expand=False).str.upper().fillna('')
+        model_rest = model.str.extract(tables.make_prefix_pattern, expand=False)
+        model = model_rest.str.strip().where(model_rest.notna(), model)
+
+        pdi = df[colmap['pdi']].map(str).str.upper() if colmap.get('pdi') else pd.Series('', index=df.index)
+        heyford = pdi.str.contains('UPPER|HEYFORD', regex=True).to_numpy(dtype=bool)
+
+        address = column('address')
+        parts = address.str.replace(ADDRESS_TRIM_PATTERN, '', regex=True).str.split(ADDRESS_SPLIT_PATTERN, n=4, regex=True, expand=True)
+        parts = parts.reindex(columns=range(4)).fillna('')
+        postcode = address.str.upper().str.extract(GR11_POSTCODE_PATTERN, expand=False).fillna('')
+
+        special = column('special')
+        special = np.where(special != '', 'VIN: ' + vin + ' ' + special, 'VIN: ' + vin)
+
+        jobs = pd.DataFrame({
+            'REG NUMBER': reg,
+            'VIN': vin,
+            'MAKE': make,
+            'MODEL': model,
+        }, index=df.index)
+        for field in GR11_COLLECTION:
+            jobs[field] = np.where(heyford, GR15_COLLECTION[field], GR11_COLLECTION[field])
+        jobs['YOUR REF NO'] = reg
+        for i in range(4):
+            jobs[f'DELIVERY ADDR{i+1}'] = parts[i]
+        jobs['DELIVERY POSTCODE'] = postcode
+        jobs['SPECIAL INSTRUCTIONS'] = special
+        jobs['PRICE'] = column('price')
+        # GR11 sheets mix both Greenhous sites, so the customer ref follows the collection address
+        jobs['CUSTOMER REF'] = np.where(heyford, 'GR15', 'GR11') if self.job_type == 'GR11' else self.job_type
+        jobs['TRANSPORT TYPE'] = ''
+        jobs = jobs.reindex(columns=JOB_FIELDS, fill_value='')
+        return [Job.from_row(row) for row in jobs.itertuples(index=False, name=None)]
+
+    def parse_file(self, file):
+        return self.parse_dataframe(self.read(file))
+
+def _parse_spreadsheet(item, job_type='GR11'):
+    filename, data = item
+    upload = io.BytesIO(data)
+    upload.filename = filename
+    try:
+        return filename, SpreadsheetParser(job_type).parse_file(upload), None
+    except Exception as e:
+        return filename, [], str(e)
+
+def parse_spreadsheets(files, workers=None, job_type='GR11'):
+    """Parse (filename, bytes) spreadsheets in a process pool. Returns (filename, jobs, error) per file, in input order."""
+    parse = partial(_parse_spreadsheet, job_type=job_type)
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1:
+        return [parse(item) for item in files]
+    with process_pool(workers) as executor:
+        return list(executor.map(parse, files))
+
+def detect_job_type(path, text=None):
+    """Guess the job type of an input file: spreadsheets are GR11, BC04 pastes have Job Sheet headers, other pastes are AC01."""
+    if path.lower().endswith(SPREADSHEET_EXTENSIONS):
+        return 'GR11'
+    if text is not None and 'Job Sheet' in text and 'Job Number' in text:
+        return 'BC04'
+    return 'AC01'
+
+def parse_path(path, job_type=None, collection_date=None, delivery_date=None, workers=1):
+    """Parse one pasted-text or spreadsheet file. Returns (job_type, jobs, rejected)."""
+    collection_date = collection_date or datetime.now().strftime('%d/%m/%Y')
+    if path.lower().endswith('.xls'):
+        raise ValueError(XLS_ERROR)
+    if path.lower().endswith(SPREADSHEET_EXTENSIONS) and job_type in (None, 'GR11', 'CW09'):
+        with open(path, 'rb') as f:
+            upload = io.BytesIO(f.read())
+        upload.filename = path
+        job_type = job_type or 'GR11'
+        return job_type, SpreadsheetParser(job_type).parse_file(upload), 0
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    job_type = job_type or detect_job_type(path, text)
+    delivery_date = delivery_date or default_delivery_date(job_type, collection_date)
+    parser = (BC04Parser if job_type == 'BC04' else JobParser)(collection_date, delivery_date)
+    jobs = parser.parse_jobs_parallel(text, workers) if workers > 1 else parser.parse_jobs(text)
+    return job_type, jobs, parser.rejected
+
+def _parse_path_safely(path, job_type, collection_date, delivery_date, workers=1):
+    try:
+        return (path,) + parse_path(path, job_type, collection_date, delivery_date, workers) + (None,)
+    except Exception as e:
+        return path, job_type, [], 0, str(e)
+
+def expand_inputs(patterns):
+    """Turn file, directory and glob arguments into a sorted, de-duplicated list of input files."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+                if name.lower().endswith(('.txt',) + SPREADSHEET_EXTENSIONS) and os.path.isfile(os.path.join(pattern, name))
+            ))
+        elif os.path.exists(pattern):
+            paths.append(pattern)
+        else:
+            paths.extend(sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p)))
+    return list(dict.fromkeys(paths))
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog='python -m job_parser_core', description='Parse job pastes and GR11/CW09 spreadsheets into transport CSVs.')
+    ap.add_argument('inputs', nargs='+', help='files, directories or glob patterns')
+    ap.add_argument('-t', '--job-type', choices=JOB_TYPES, help='job type for every input (default: detect per file)')
+    ap.add_argument('-c', '--collection-date', help='dd/mm/yyyy (default: today)')
+    ap.add_argument('-d', '--delivery-date', help='dd/mm/yyyy (default: per job type, from the collection date)')
+    ap.add_argument('-o', '--output-dir', help='write one CSV per input here instead of streaming everything to stdout')
+    ap.add_argument('-w', '--workers', type=int, default=1, help='parse this many inputs at once (or split one large paste across them)')
+    args = ap.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        ap.error('no input files found')
+    writer = fieldnames = None
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    else:
+        # A single stream needs one header: the spreadsheet columns if every input is a spreadsheet, else all columns
+        spreadsheets_only = all(p.lower().endswith(SPREADSHEET_EXTENSIONS) for p in paths) and args.job_type in (None, 'GR11', 'CW09')
+        fieldnames = GR11_FIELDNAMES if spreadsheets_only else JOB_FIELDS
+        writer = csv.writer(sys.stdout)
+        writer.writerow(fieldnames)
+
+    parse = partial(_parse_path_safely, job_type=args.job_type, collection_date=args.collection_date, delivery_date=args.delivery_date)
+    if len(paths) == 1:
+        return write_results([parse(paths[0], workers=args.workers)], args.output_dir, writer, fieldnames)
+    if args.workers <= 1:
+        return write_results(map(parse, paths), args.output_dir, writer, fieldnames)
+    with process_pool(args.workers) as executor:
+        return write_results(executor.map(parse, paths), args.output_dir, writer, fieldnames)
+
+def write_results(results, output_dir, writer, fieldnames):
+    """Write each parsed input as it arrives, reporting per-file counts on stderr. Returns the exit status."""
+    failed = 0
+    for path, job_type, jobs, rejected, error in results:
+        if error:
+            failed += 1
+            print(f'{path}: error: {error}', file=sys.stderr)
+            continue
+        if output_dir:
+            file_fields = GR11_FIELDNAMES if job_type in ('GR11', 'CW09') else JOB_FIELDS
+            out_path = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + '.csv')
+            with open(out_path, 'w', encoding='utf-8', newline='') as f:
+                out = csv.writer(f)
+                out.writerow(file_fields)
+                out.writerows(job.to_row(file_fields) for job in jobs)
+        else:
+            writer.writerows(job.to_row(fieldnames) for job in jobs)
+        print(f'{path}: {len(jobs)} {job_type} jobs' + (f', {rejected} rejected' if rejected else ''), file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
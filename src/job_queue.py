@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+class ParseQueue:
+    """Bounded in-process queue of parse tasks run by a small pool of worker threads.
+
+    With a store (put_job/get_job/delete_jobs), records are mirrored at each status change, and at most
+    once per progress_interval seconds while jobs are parsed, so other worker processes can report on them.
+    """
+    def __init__(self, workers=2, max_pending=20, keep_finished=200, store=None, progress_interval=1.0):
+        self.workers = workers
+        self.store = store
+        self.progress_interval = progress_interval
+        # Monotonic time each running record's progress is next mirrored to the store
+        self.progress_due = {}
+        self.tasks = queue.Queue(maxsize=max_pending)
+        self.keep_finished = keep_finished
+        self.records = {}
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'parse-worker-{i}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, fn, *args, user=None, job_type=None):
+        """Queue fn(record, *args) and return its record. Raises queue.Full when the queue is at capacity."""
+        self.start()
+        record = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'job_type': job_type,
+            'user': user,
+            'submitted': datetime.now().strftime('%Y%m%d_%H%M%S'),
+            'jobs_parsed': 0,
+            'error': None,
+            'result': None,
+        }
+        with self.lock:
+            self.records[record['id']] = record
+        try:
+            self.tasks.put_nowait((record, fn, args))
+        except queue.Full:
+            with self.lock:
+                del self.records[record['id']]
+            raise
+        self._save(record)
+        return record
+
+    def get(self, job_id):
+        with self.lock:
+            record = self.records.get(job_id)
+            if record:
+                return dict(record)
+        return self.store.get_job(job_id) if self.store else None
+
+    def pending(self):
+        return self.tasks.qsize()
+
+    def drain(self, timeout=None):
+        """Wait until every queued task has finished. Returns False if timeout ran out first."""
+        with self.tasks.all_tasks_done:
+            return self.tasks.all_tasks_done.wait_for(lambda: not self.tasks.unfinished_tasks, timeout)
+
+    def progress(self, record, count):
+        """Set record's jobs_parsed, mirroring it to the store if progress_interval has passed since the last time."""
+        record['jobs_parsed'] = count
+        if not self.store:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now < self.progress_due.get(record['id'], 0):
+                return
+            self.progress_due[record['id']] = now + self.progress_interval
+        self._save(record)
+
+    def _save(self, record):
+        if self.store:
+            self.store.put_job(dict(record))
+
+    def _worker(self):
+        while True:
+            record, fn, args = self.tasks.get()
+            record['status'] = 'running'
+            self._save(record)
+            try:
+                record['result'] = fn(record, *args)
+                record['status'] = 'done'
+            except Exception as e:
+                record['error'] = str(e)
+                record['status'] = 'failed'
+            finally:
+                with self.lock:
+                    self.progress_due.pop(record['id'], None)
+                self._save(record)
+                self.tasks.task_done()
+                self._prune()
+
+    def _prune(self):
+        with self.lock:
+            finished = [r for r in self.records.values() if r['status'] in ('done', 'failed')]
+            expired = [record['id'] for record in finished[:max(0, len(finished) - self.keep_finished)]]
+            for job_id in expired:
+                del self.records[job_id]
+        if expired and self.store:
+            self.store.delete_jobs(expired)
@@ -0,0 +1,165 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Minimal thread-safe counters and latency histograms rendered in the Prometheus text format.
+
+    After share(directory), each process publishes its totals to a snapshot file there (at most every
+    flush_interval seconds) and render() adds up every snapshot, so any worker can answer a scrape.
+    """
+    def __init__(self, prefix='jobparser', flush_interval=2):
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}
+        self.histograms = {}
+        self.shared_dir = None
+        self.snapshot_path = None
+        self.flush_timer = None
+
+    def share(self, shared_dir):
+        os.makedirs(shared_dir, exist_ok=True)
+        self.shared_dir = shared_dir
+        self.reset()
+
+    def reset(self):
+        """Start from zero under a new snapshot file, e.g. in a worker forked from the process that set up metrics."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.flush_timer = None
+            if self.shared_dir:
+                self.snapshot_path = os.path.join(self.shared_dir, f'{os.getpid()}-{uuid.uuid4().hex}.json')
+
+    def _changed(self):
+        # Called with the lock held
+        if self.shared_dir and self.flush_timer is None:
+            self.flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self):
+        """Write this process's totals to its snapshot file."""
+        with self.lock:
+            self.flush_timer = None
+            if not self.snapshot_path:
+                return
+            path = self.snapshot_path
+            snapshot = {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, buckets, count, total] for (name, labels), (buckets, count, total) in self.histograms.items()],
+            }
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+
+    def _collect(self):
+        """Return (counters, histograms) for this process, or summed over every snapshot when shared."""
+        if not self.shared_dir:
+            with self.lock:
+                return dict(self.counters), {k: (list(v[0]), v[1], v[2]) for k, v in self.histograms.items()}
+        self.flush()
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.shared_dir, '*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, count, total in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                hist = histograms.get(key)
+                if hist is None:
+                    histograms[key] = (list(buckets), count, total)
+                else:
+                    histograms[key] = ([a + b for a, b in zip(hist[0], buckets)], hist[1] + count, hist[2] + total)
+        return counters, histograms
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._changed()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * len(LATENCY_BUCKETS), 0, 0.0]
+            buckets, _, _ = hist
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            hist[1] += 1
+            hist[2] += seconds
+            self._changed()
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def _labels(self, labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in pairs) + '}'
+
+    def render(self):
+        lines = []
+        counters, histograms = self._collect()
+        described = set()
+        for (name, labels), value in sorted(counters.items()):
+            full = f'{self.prefix}_{name}'
+            if name not in described and name in self.help:
+                lines.append(f'# HELP {full} {self.help[name][1]}')
+                lines.append(f'# TYPE {full} counter')
+                described.add(name)
+            lines.append(f'{full}{self._labels(labels)} {value}')
+        for (name, labels), (buckets, count, total) in sorted(histograms.items()):
+            full = f'{self.prefix}_{name}'
+            if name not in described and name in self.help:
+                lines.append(f'# HELP {full} {self.help[name][1]}')
+                lines.append(f'# TYPE {full} histogram')
+                described.add(name)
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'{full}_bucket{self._labels(labels, [("le", bound)])} {n}')
+            lines.append(f'{full}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{full}_sum{self._labels(labels)} {total}')
+            lines.append(f'{full}_count{self._labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('stage_seconds', 'histogram', 'Time spent in each stage of handling a parse, by stage and job type.')
+metrics.describe('jobs_parsed_total', 'counter', 'Jobs parsed, by job type.')
+metrics.describe('jobs_rejected_total', 'counter', 'Job blocks dropped by the parser (e.g. BC04 sections without a REG NUMBER), by job type.')
+metrics.describe('bytes_in_total', 'counter', 'Bytes of pasted text or uploaded spreadsheet received, by job type.')
+metrics.describe('bytes_out_total', 'counter', 'Bytes of CSV sent back, by job type.')
+metrics.describe('parses_total', 'counter', 'Parse requests, by job type and outcome.')
+metrics.describe('logins_total', 'counter', 'Login attempts, by outcome (ok, failed, throttled, busy).')
+metrics.describe('jobs_duplicate_total', 'counter', 'Parsed jobs whose REG + VIN + collection date was already in an earlier batch, by job type.')
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def parse_cache_key(job_type, payload, collection_date, delivery_date, reference_version=None):
+    """Hash the normalized input together with everything else that changes the parsed output."""
+    digest = hashlib.sha256()
+    parts = (job_type, collection_date, delivery_date)
+    if reference_version:
+        parts += (reference_version,)
+    for part in parts:
+        digest.update((part or '').encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(payload if isinstance(payload, bytes) else payload.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Bounded LRU of parse results keyed on input hash, with an optional JSON-file tier on disk.
+
+    The disk tier is capped at max_entries files too: a hit bumps the file's mtime and each put prunes the
+    least recently used files past the cap, whichever worker process wrote them.
+    """
+    def __init__(self, max_entries=1024, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.json')
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(self._disk_path(key))
+        except OSError:
+            pass
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            tmp_path = self._disk_path(key) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, self._disk_path(key))
+            self._prune_disk()
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _prune_disk(self):
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    try:
+                        files.append((entry.stat().st_mtime_ns, entry.path))
+                    except OSError:
+                        pass
+        if len(files) <= self.max_entries:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Another worker pruned it first
+                pass
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class BlockCache:
+    """Parsed job blocks per preview session, keyed by a hash of each block, so a re-preview only parses edited blocks."""
+    def __init__(self, max_sessions=256, max_blocks=5000):
+        self.max_sessions = max_sessions
+        self.max_blocks = max_blocks
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def block_key(job_type, collection_date, delivery_date, block):
+        return parse_cache_key(job_type, block, collection_date, delivery_date)
+
+    def blocks(self, session_id):
+        with self.lock:
+            blocks = self.sessions.get(session_id)
+            if blocks is not None:
+                self.sessions.move_to_end(session_id)
+            return blocks or {}
+
+    def replace(self, session_id, blocks):
+        """Keep only the blocks from the latest preview, so edited-away blocks do not pile up."""
+        if len(blocks) > self.max_blocks:
+            blocks = dict(list(blocks.items())[:self.max_blocks])
+        with self.lock:
+            self.sessions[session_id] = blocks
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+
+
+class ReferenceTables:
+    """One compiled snapshot of the reference file: make and location regexes plus alias dicts."""
+    def __init__(self, data, version):
+        self.version = version
+        self.makes = [make.upper() for make in data.get('makes', [])]
+        # One alternation, in file order, so a row is scanned once however many makes there are
+        makes = '|'.join(re.escape(make) for make in self.makes) or '(?!)'
+        self.make_pattern = '(?i)(' + makes + ')'
+        self.make_prefix_pattern = '(?is)^(?:' + makes + ')(.*)$'
+        self.alias_keys = {
+            alias.strip().lower(): key for key, aliases in data.get('column_aliases', {}).items() for alias in aliases
+        }
+        self.location_renames = dict(data.get('location_renames', {}))
+        self.location_renames_re = self._alternation(self.location_renames)
+        self.location_overrides = dict(data.get('location_overrides', {}))
+        self.location_overrides_re = self._alternation(self.location_overrides)
+
+    @staticmethod
+    def _alternation(table):
+        if not table:
+            return None
+        # Longest first so an alias that contains a shorter one still wins
+        return re.compile('|'.join(re.escape(text) for text in sorted(table, key=len, reverse=True)))
+
+    def rename_location(self, name):
+        if self.location_renames_re:
+            name = self.location_renames_re.sub(lambda m: self.location_renames[m.group(0)], name)
+        if self.location_overrides_re:
+            match = self.location_overrides_re.search(name)
+            if match:
+                return self.location_overrides[match.group(0)]
+        return name
+
+
+class ReferenceData:
+    """Reference tables loaded from a JSON file and recompiled when its mtime changes.
+
+    The file is stat'ed at most once per check_interval seconds. A file that fails to load on reload is
+    reported and the previous tables are kept; at startup the error is raised.
+    """
+    def __init__(self, path, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.next_check = 0
+        self.tables = self._load()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        tables = ReferenceTables(json.loads(raw), hashlib.sha256(raw).hexdigest()[:16])
+        self.mtime = mtime
+        return tables
+
+    def current(self):
+        """Return the latest ReferenceTables, reloading first if the file changed."""
+        now = time.monotonic()
+        if now < self.next_check:
+            return self.tables
+        with self.lock:
+            if now >= self.next_check:
+                self.next_check = now + self.check_interval
+                try:
+                    mtime = os.stat(self.path).st_mtime_ns
+                    if mtime != self.mtime:
+                        # Remember the mtime even if the load fails, so a broken file is reported once
+                        self.mtime = mtime
+                        self.tables = self._load()
+                except (OSError, ValueError, AttributeError, TypeError):
+                    traceback.print_exc()
+        return self.tables
@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class UserStore:
+    """Users in SQLite, so each admin change is one atomic row update instead of a users.json rewrite."""
+    def __init__(self, db_path, legacy_json=None, cache_ttl=30):
+        self.db_path = db_path
+        self.cache_ttl = cache_ttl
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS users ('
+                'username TEXT PRIMARY KEY, password TEXT NOT NULL, enabled INTEGER NOT NULL DEFAULT 1)'
+            )
+        if legacy_json and os.path.exists(legacy_json) and not self.count():
+            self.import_json(legacy_json)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def reopen(self):
+        """Open a fresh connection, e.g. in a worker process forked after the store was created."""
+        with self.lock:
+            self.conn = self._connect()
+            self.cache.clear()
+
+    def import_json(self, path):
+        """Load a users.json mapping of username -> {'password', 'enabled'} into the store."""
+        with open(path, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO users (username, password, enabled) VALUES (?, ?, ?)',
+                [(name, user['password'], int(user.get('enabled', False))) for name, user in users.items()]
+            )
+            self.cache.clear()
+
+    def get(self, username):
+        """Return {'password', 'enabled'} for username, or None. Found users are cached for cache_ttl seconds per process.
+
+        Misses are not cached, so made-up usernames cannot grow the cache.
+        """
+        now = time.monotonic()
+        with self.lock:
+            hit = self.cache.get(username)
+            if hit and hit[0] > now:
+                return hit[1]
+            row = self.conn.execute('SELECT password, enabled FROM users WHERE username = ?', (username,)).fetchone()
+            if row is None:
+                return None
+            user = {'password': row['password'], 'enabled': bool(row['enabled'])}
+            self.cache[username] = (now + self.cache_ttl, user)
+            return user
+
+    def add(self, username, password_hash, enabled=True):
+        """Insert a user. Returns False if the username is taken."""
+        with self.lock, self.conn:
+            added = self.conn.execute(
+                'INSERT OR IGNORE INTO users (username, password, enabled) VALUES (?, ?, ?)',
+                (username, password_hash, int(enabled))
+            ).rowcount == 1
+            self.cache.pop(username, None)
+        return added
+
+    def update(self, username, password=None, enabled=None):
+        """Change a user's password hash and/or enabled flag. Returns False if there is no such user."""
+        fields, params = [], []
+        if password is not None:
+            fields.append('password = ?')
+            params.append(password)
+        if enabled is not None:
+            fields.append('enabled = ?')
+            params.append(int(enabled))
+        if not fields:
+            return username in self
+        with self.lock, self.conn:
+            updated = self.conn.execute(
+                'UPDATE users SET ' + ', '.join(fields) + ' WHERE username = ?', params + [username]
+            ).rowcount == 1
+            self.cache.pop(username, None)
+        return updated
+
+    def all(self):
+        with self.lock:
+            rows = self.conn.execute('SELECT username, password, enabled FROM users ORDER BY username').fetchall()
+        return {row['username']: {'password': row['password'], 'enabled': bool(row['enabled'])} for row in rows}
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,558 +1,149 @@
-from flask import Flask, render_template_string, request, send_file, redirect, url_for, session, abort, flash
+from flask import Flask, Response, render_template, request, send_file, send_from_directory, redirect, url_for, session, abort, flash, jsonify
 import io
 import csv
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import sys
-import pandas as pd
-import holidays
-import json
-import bcrypt
-from functools import wraps
+import hashlib
+import itertools
+import queue
 import re
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache, wraps
 
 # Import parser classes
 sys.path.append(os.path.dirname(__file__))
-from job_parser_core import JobParser, BC04Parser
-
-app = Flask(__name__)
+from job_parser_core import JobParser, BC04Parser, SpreadsheetParser, JOB_FIELDS, GR11_FIELDNAMES, PARALLEL_THRESHOLD, SPREADSHEET_EXTENSIONS, default_delivery_date, parse_spreadsheets, reference_data, uk_calendar
+from job_queue import ParseQueue
+from history_store import HistoryStore
+from metrics import metrics
+from parse_cache import ParseCache, BlockCache, parse_cache_key
+from user_store import UserStore
+from auth import PasswordVerifier, LoginThrottle, VerifierBusy
+from duplicates import SeenJobs, job_fingerprint
+
+# Static files are served by static_files() below so versioned assets get long-lived cache headers
+app = Flask(__name__, static_folder=None)
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB upload limit
-
-# Delivery date calculation logic
-uk_holidays = holidays.UK()
+# Pasted jobs arrive as multipart text fields, which Flask otherwise caps at 500KB
+app.config['MAX_FORM_MEMORY_SIZE'] = app.config['MAX_CONTENT_LENGTH']
+# Behind Railway/Replit-style proxies, set PROXY_HOPS so remote_addr (and the login throttle) sees the real client
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 0))
+if PROXY_HOPS:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
 
 HISTORY_FILE = os.path.join(os.path.dirname(__file__), 'job_history.json')
+HISTORY_DB = os.path.join(os.path.dirname(__file__), 'job_history.db')
 USERS_FILE = os.path.join(os.path.dirname(__file__), 'users.json')
+USERS_DB = os.path.join(os.path.dirname(__file__), 'users.db')
+SEEN_JOBS_DB = os.path.join(os.path.dirname(__file__), 'seen_jobs.db')
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+HISTORY_DIR = os.path.join(STATIC_DIR, 'history')
+STATIC_MAX_AGE = 365 * 24 * 3600
+CSV_CHUNK_SIZE = 16 * 1024
+HISTORY_PAGE_SIZE = 25
+# Inputs larger than this many bytes are parsed by the background queue; kept under the form size limit so the UI can reach it
+ASYNC_PARSE_THRESHOLD = min(int(os.environ.get('ASYNC_PARSE_THRESHOLD', 512 * 1024)), app.config['MAX_FORM_MEMORY_SIZE'])
+# Month-end batches of dealer workbooks get a bigger upload limit and a process pool
+BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 100 * 1024 * 1024))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 0)) or None
+# Jobs whose REG + VIN + collection date was in an earlier batch: 'flag' marks them, 'drop' leaves them out, 'off' skips the check
+DUPLICATE_MODE = os.environ.get('DUPLICATE_MODE', 'flag')
+DUPLICATE_MARKER = 'DUPLICATE: '
 SECRET_KEY = 'REPLACE_THIS_WITH_A_RANDOM_SECRET_KEY'
 app.secret_key = SECRET_KEY
 
-def load_job_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+def load_job_history(**filters):
+    return history_store.query(**filters)
 
-def save_job_history(history):
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+def save_job_history(record):
+    history_store.append(record)
 
-def load_users():
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+_history_snapshot = (None, frozenset())
 
-def save_users(users):
-    with open(USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+def history_file_snapshot():
+    """Return (mtime, names) for static/history, relisting the directory only when its mtime changes."""
+    global _history_snapshot
+    try:
+        mtime = os.stat(HISTORY_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return None, frozenset()
+    if _history_snapshot[0] != mtime:
+        _history_snapshot = (mtime, frozenset(os.listdir(HISTORY_DIR)))
+    return _history_snapshot
 
+# bcrypt is imported on first use to keep it off the cold-start path
 def hash_password(password):
+    import bcrypt
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def check_password(password, hashed):
+    import bcrypt
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        if 'username' not in session or not session.get('username') or not users.get(session['username'], {}).get('enabled', False):
+        if 'username' not in session or not session.get('username') or not (users.get(session['username']) or {}).get('enabled', False):
             return redirect(url_for('login', next=request.path))
         return f(*args, **kwargs)
     return decorated
 
-job_history = load_job_history()
-users = load_users()
+history_store = HistoryStore(HISTORY_DB, legacy_json=HISTORY_FILE)
+# users.json is imported once; after that each admin change is a single row update
+users = UserStore(USERS_DB, legacy_json=USERS_FILE, cache_ttl=int(os.environ.get('USER_CACHE_TTL', 30)))
+password_verifier = PasswordVerifier(
+    check_password,
+    workers=int(os.environ.get('BCRYPT_WORKERS', 2)),
+    max_pending=int(os.environ.get('BCRYPT_MAX_PENDING', 16)),
+    cache_ttl=int(os.environ.get('LOGIN_CACHE_TTL', 300)),
+)
+seen_jobs = SeenJobs(SEEN_JOBS_DB, capacity=int(os.environ.get('DUPLICATE_CAPACITY', 1000000)))
+login_throttle = LoginThrottle(max_failures=int(os.environ.get('LOGIN_MAX_FAILURES', 5)), window=int(os.environ.get('LOGIN_WINDOW', 300)), db_path=USERS_DB)
+parse_cache = ParseCache(max_entries=int(os.environ.get('PARSE_CACHE_SIZE', 1024)), disk_dir=os.environ.get('PARSE_CACHE_DIR'))
+# With several worker processes, each publishes its metrics here so /metrics reports the whole server
+if os.environ.get('METRICS_DIR'):
+    metrics.share(os.environ['METRICS_DIR'])
+preview_cache = BlockCache(max_sessions=int(os.environ.get('PREVIEW_SESSIONS', 256)))
+parse_queue = ParseQueue(workers=int(os.environ.get('PARSE_WORKERS', 2)), max_pending=int(os.environ.get('PARSE_QUEUE_SIZE', 20)), store=history_store)
 
 # Ensure at least one user exists
-if not users:
+if not users.count():
     # Create a default user
-    users = {
-        'bradlakin1': {
-            'password': hash_password('301103'),
-            'enabled': True
-        }
-    }
-    save_users(users)
+    users.add('bradlakin1', hash_password('301103'))
 
+# Delivery date calculation logic
 def calculate_delivery_date_ac01(collection_date_str):
     collection_date = datetime.strptime(collection_date_str, "%d/%m/%Y")
-    current_date = collection_date
-    business_days = 0
-    while business_days < 3:
-        current_date += timedelta(days=1)
-        if current_date.weekday() < 5 and current_date not in uk_holidays:
-            business_days += 1
-    return current_date.strftime("%d/%m/%Y")
+    return uk_calendar.add_business_days(collection_date, 3).strftime("%d/%m/%Y")
 
 def calculate_delivery_date_bc04(collection_date_str):
     collection_date = datetime.strptime(collection_date_str, "%d/%m/%Y")
-    delivery = collection_date + timedelta(days=1)
-    while delivery.weekday() >= 5 or delivery in uk_holidays:
-        delivery += timedelta(days=1)
-    return delivery.strftime("%d/%m/%Y")
-
-TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>Intertechnic Jobs</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Arial, sans-serif;
-            background: linear-gradient(120deg, #f5f7fa 0%, #e0f2e9 100%);
-            margin: 0;
-            padding: 0;
-        }
-        .header-bar {
-            background: #1b6e3a;
-            color: #fff;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            height: 92px;
-            box-shadow: 0 2px 12px #0002;
-            padding: 0;
-            position: relative;
-            z-index: 10;
-        }
-        .header-content {
-            display: flex;
-            align-items: center;
-            gap: 14px;
-            padding: 0 0 0 0;
-        }
-        .admin-link {
-            position: absolute;
-            right: 36px;
-            top: 50%;
-            transform: translateY(-50%);
-            color: #fff;
-            background: #388f2a;
-            padding: 8px 18px;
-            border-radius: 7px;
-            font-size: 1.08em;
-            font-weight: 600;
-            text-decoration: none;
-            box-shadow: 0 2px 8px #1b6e3a22;
-            transition: background 0.2s;
-        }
-        .admin-link:hover {
-            background: #1b6e3a;
-        }
-        .logo-blend {
-            background: rgba(255,255,255,0.7);
-            border-radius: 10px;
-            box-shadow: 0 1px 4px #1b6e3a11;
-            padding: 3px 10px 3px 10px;
-            display: flex;
-            align-items: center;
-            height: 44px;
-        }
-        .logo {
-            height: 32px;
-            width: auto;
-            display: block;
-        }
-        .header-title {
-            font-size: 2.1em;
-            font-weight: 700;
-            letter-spacing: 1px;
-            display: flex;
-            align-items: center;
-            height: 44px;
-            margin-left: 0;
-        }
-        .header-divider {
-            position: absolute;
-            left: 0; right: 0; bottom: 0;
-            height: 4px;
-            background: linear-gradient(90deg, #1b6e3a 0%, #4e6ed6 100%);
-            opacity: 0.12;
-        }
-        .container {
-            max-width: 700px;
-            margin: 48px auto 0 auto;
-            background: #fff;
-            border-radius: 18px;
-            box-shadow: 0 8px 32px #1b6e3a22;
-            padding: 0;
-            overflow: hidden;
-        }
-        .accent-bar {
-            height: 8px;
-            background: linear-gradient(90deg, #1b6e3a 0%, #4e6ed6 100%);
-        }
-        .form-card {
-            background: linear-gradient(120deg, #f7faff 60%, #e9ecf3 100%);
-            padding: 48px 40px 36px 40px;
-            border-radius: 0 0 18px 18px;
-            box-shadow: 0 2px 12px #1b6e3a11;
-        }
-        .section-title {
-            display: flex;
-            align-items: center;
-            font-size: 2.3em;
-            font-weight: 700;
-            color: #1b6e3a;
-            margin-bottom: 16px;
-            letter-spacing: 0.5px;
-        }
-        .section-icon {
-            background: #1b6e3a;
-            color: #fff;
-            border-radius: 50%;
-            width: 48px;
-            height: 48px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 1.7em;
-            margin-right: 20px;
-            box-shadow: 0 2px 8px #1b6e3a22;
-        }
-        label {
-            font-weight: 600;
-            display: block;
-            margin-top: 18px;
-            margin-bottom: 6px;
-        }
-        .helper {
-            color: #6b7ba3;
-            font-size: 0.98em;
-            margin-bottom: 8px;
-            margin-top: -2px;
-        }
-        select, textarea, input[type="text"] {
-            width: 100%;
-            padding: 12px;
-            margin-top: 0;
-            border-radius: 7px;
-            border: 1.5px solid #bfc7d1;
-            font-size: 1.08em;
-            background: #f7f9fc;
-            transition: border 0.2s;
-        }
-        select:focus, textarea:focus, input[type="text"]:focus {
-            border: 2px solid #1b6e3a;
-            outline: none;
-            background: #fff;
-        }
-        textarea {
-            min-height: 160px;
-            font-family: 'Consolas', 'Menlo', monospace;
-            resize: vertical;
-        }
-        .date-fields-card {
-            background: #f7f9fc;
-            border: 1.5px solid #bfc7d1;
-            border-radius: 10px;
-            box-shadow: 0 2px 8px #1b6e3a11;
-            padding: 24px 24px 10px 24px;
-            margin: 28px 0 18px 0;
-        }
-        .date-labels {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 32px;
-            align-items: start;
-            margin-bottom: 0;
-        }
-        .date-labels > div {
-            display: flex;
-            flex-direction: column;
-            justify-content: flex-start;
-        }
-        .date-labels label {
-            margin-bottom: 4px;
-        }
-        .date-labels input[type="text"] {
-            width: 100%;
-            box-sizing: border-box;
-            min-height: 44px;
-            margin-bottom: 0;
-            font-size: 1.08em;
-        }
-        @media (max-width: 700px) {
-            .date-labels {
-                grid-template-columns: 1fr;
-                gap: 0;
-            }
-            .date-labels > div {
-                margin-bottom: 18px;
-            }
-        }
-        .btn {
-            background: linear-gradient(90deg, #1b6e3a 60%, #388f2a 100%);
-            color: #fff;
-            border: none;
-            padding: 20px 0;
-            border-radius: 8px;
-            font-size: 1.25em;
-            margin-top: 32px;
-            width: 100%;
-            cursor: pointer;
-            font-weight: 700;
-            box-shadow: 0 4px 16px #1b6e3a22;
-            transition: background 0.2s, box-shadow 0.2s;
-        }
-        .btn:hover {
-            background: linear-gradient(90deg, #388f2a 60%, #1b6e3a 100%);
-            box-shadow: 0 8px 24px #1b6e3a33;
-        }
-        .btn:disabled {
-            background: #bfc7d1;
-            color: #fff;
-            cursor: not-allowed;
-        }
-        .divider {
-            border: none;
-            border-top: 2px solid #e0e4ef;
-            margin: 36px 0 18px 0;
-        }
-        .job-count {
-            color: #1b6e3a;
-            font-size: 1.08em;
-            font-weight: 600;
-            margin-top: 8px;
-            margin-bottom: 0;
-            text-align: right;
-        }
-        .error {
-            color: #d00;
-            margin-top: 16px;
-            font-weight: 500;
-        }
-        .debug {
-            color: #888;
-            font-size: 0.97em;
-            margin-top: 12px;
-            background: #f7f7f7;
-            padding: 10px;
-            border-radius: 6px;
-        }
-        .footer {
-            text-align: center;
-            color: #bfc7d1;
-            margin-top: 60px;
-            font-size: 1em;
-            letter-spacing: 0.5px;
-        }
-        .history-section {
-            margin: 48px auto 0 auto;
-            max-width: 700px;
-            background: #fff;
-            border-radius: 18px;
-            box-shadow: 0 8px 32px #1b6e3a22;
-            padding: 32px 40px 32px 40px;
-        }
-        .history-title {
-            font-size: 1.5em;
-            font-weight: 700;
-            color: #1b6e3a;
-            margin-bottom: 18px;
-            display: flex;
-            align-items: center;
-        }
-        .history-icon {
-            background: #1b6e3a;
-            color: #fff;
-            border-radius: 50%;
-            width: 32px;
-            height: 32px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 1.1em;
-            margin-right: 12px;
-        }
-        .history-table {
-            width: 100%;
-            border-collapse: collapse;
-            margin-top: 10px;
-        }
-        .history-table th, .history-table td {
-            border: 1px solid #e0e4ef;
-            padding: 10px 12px;
-            text-align: left;
-        }
-        .history-table th {
-            background: #f5f7fa;
-            color: #1b6e3a;
-            font-weight: 600;
-        }
-        .history-table tr:nth-child(even) {
-            background: #f7f9fc;
-        }
-        .history-table tr:hover {
-            background: #e0f2e9;
-            transition: background 0.2s;
-        }
-        .info-box {
-            background: #eaf6ff;
-            border-left: 5px solid #1b6e3a;
-            color: #1b6e3a;
-            padding: 14px 18px;
-            margin-bottom: 18px;
-            border-radius: 7px;
-            font-size: 1.05em;
-        }
-    </style>
-    <script>
-    function autoSetDeliveryDate() {
-        var jobType = document.getElementById('job_type').value;
-        var collection = document.getElementById('collection_date').value;
-        var delivery = document.getElementById('delivery_date');
-        if (jobType === 'AC01' || jobType === 'BC04') {
-            var xhr = new XMLHttpRequest();
-            xhr.open('POST', '/auto_delivery_date', true);
-            xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded');
-            xhr.onreadystatechange = function() {
-                if (xhr.readyState === 4 && xhr.status === 200) {
-                    delivery.value = xhr.responseText;
-                }
-            };
-            xhr.send('job_type=' + encodeURIComponent(jobType) + '&collection_date=' + encodeURIComponent(collection));
-        }
-    }
-    function updateJobCount() {
-        var textarea = document.getElementById('job_data');
-        var jobType = document.getElementById('job_type').value;
-        var count = 0;
-        if (textarea && (jobType === 'AC01' || jobType === 'EU01' || jobType === 'BC04')) {
-            var text = textarea.value;
-            // Count jobs by counting 'FROM' at the start of a line
-            var matches = text.match(/^FROM/mg);
-            if (matches) count = matches.length;
-        }
-        document.getElementById('job_count').innerText = count + (count === 1 ? ' job found' : ' jobs found');
-    }
-    window.onload = function() {
-        var textarea = document.getElementById('job_data');
-        if (textarea) {
-            textarea.addEventListener('input', updateJobCount);
-            updateJobCount();
-        }
-    };
-    </script>
-</head>
-<body>
-    <div class="header-bar">
-        <div class="header-content">
-            <span class="logo-blend">
-                <img src="{{ url_for('static', filename='intertechnic_logo.gif') }}" class="logo" alt="Intertechnic Logo" onerror="this.onerror=null;this.src='https://via.placeholder.com/180x54?text=Logo+Missing';">
-            </span>
-            <div class="header-title">Intertechnic Jobs</div>
-        </div>
-        {% if username in ['admin', 'bradlakin1'] %}
-        <a href="/admin" class="admin-link">Admin</a>
-        {% endif %}
-        <div class="header-divider"></div>
-    </div>
-    <div class="container">
-        <div class="accent-bar"></div>
-        <div class="form-card">
-            <div class="section-title">
-                <span class="section-icon">📄</span>
-                Job Submission
-            </div>
-            <form method="POST" enctype="multipart/form-data">
-                <label for="job_type">Job Type:</label>
-                <div class="helper">Select the type of job you want to process.</div>
-                <select name="job_type" id="job_type" onchange="this.form.submit()">
-                    <option value="AC01" {% if job_type == 'AC01' %}selected{% endif %}>AC01</option>
-                    <option value="BC04" {% if job_type == 'BC04' %}selected{% endif %}>BC04</option>
-                    <option value="GR11" {% if job_type == 'GR11' %}selected{% endif %}>GR11</option>
-                    <option value="CW09" {% if job_type == 'CW09' %}selected{% endif %}>CW09</option>
-                    <option value="EU01" {% if job_type == 'EU01' %}selected{% endif %}>EU01</option>
-                </select>
-
-                {% if job_type == 'AC01' %}
-                <div class="info-box">
-                    <b>Note on AC01 Parsing Accuracy:</b><br>
-                    The AC01 parser is highly accurate (99%) and requires release codes to function correctly. In rare cases, it may confuse address fields and place the town name twice (for example, 'St. Margarets Way' could be replaced with 'LEICESTER'). This is usually easy to spot, as the phone number will appear as a placeholder (e.g., 500000000000) if the address is not parsed correctly. Please double-check the output for these rare cases.
-                </div>
-                {% endif %}
-
-                {% if job_type == 'BC04' %}
-                <div class="info-box">
-                    <b>Note on BC04 Parsing Accuracy:</b><br>
-                    The BC04 parser is approximately 80% accurate, requires release codes, and is still under active development. Please review the output carefully.
-                </div>
-                {% endif %}
-
-                {% if job_type == 'EU01' %}
-                <div class="info-box">
-                    <b>EU01 Parsing:</b><br>
-                    EU01 parsing is coming soon and is not yet available.
-                </div>
-                {% endif %}
-
-                {% if job_type == 'CW09' %}
-                <div class="info-box">
-                    <b>Note on CW09 Parsing Accuracy:</b><br>
-                    The CW09 parser is approximately 80% accurate and has not been fully developed yet. Use with caution.
-                </div>
-                {% endif %}
-
-                {% if job_type in ['AC01', 'BC04', 'EU01'] %}
-                    <label for="job_data">Paste Job Data:</label>
-                    <div class="helper">Paste the job text exactly as provided by your source.</div>
-                    <textarea name="job_data" id="job_data">{{ job_data|default('') }}</textarea>
-                    <div class="job-count" id="job_count">0 jobs found</div>
-                {% endif %}
-
-                {% if job_type in ['GR11', 'CW09'] %}
-                    <label>Upload Excel/CSV (for GR11/CW09):</label>
-                    <div class="helper">Upload the Excel or CSV file for this job type.</div>
-                    <input type="file" name="file">
-                {% endif %}
-
-                <div class="date-fields-card">
-                    <div class="date-labels">
-                        <div>
-                            <label for="collection_date">Collection Date (DD/MM/YYYY):</label>
-                            <input type="text" name="collection_date" id="collection_date" value="{{ collection_date|default('') }}" oninput="autoSetDeliveryDate()">
-                        </div>
-                        <div>
-                            <label for="delivery_date">Delivery Date (DD/MM/YYYY):</label>
-                            <input type="text" name="delivery_date" id="delivery_date" value="{{ delivery_date|default('') }}">
-                        </div>
-                    </div>
-                </div>
-                <button class="btn" type="submit">Process Jobs</button>
-                <hr class="divider">
-                {% if error %}
-                    <div class="error">{{ error }}</div>
-                {% endif %}
-                {% if debug %}
-                    <div class="debug">{{ debug|safe }}</div>
-                {% endif %}
-            </form>
-        </div>
-    </div>
-    <div class="history-section">
-        <div class="history-title"><span class="history-icon">📊</span>Job History</div>
-        <table class="history-table">
-            <tr><th>Timestamp</th><th>Job Type</th><th>CSV File</th><th>User</th></tr>
-            {% for row in job_history %}
-            <tr>
-                <td>{{ row.timestamp }}</td>
-                <td>{{ row.job_type }}</td>
-                <td><a href="{{ url_for('protected_history_file', filename=row.csv_path.split('/')[-1]) }}" target="_blank">Download</a></td>
-                <td>{{ row.user or 'N/A' }}</td>
-            </tr>
-            {% endfor %}
-            {% if not job_history %}
-            <tr><td colspan="4" style="text-align:center; color:#aaa;">No jobs processed yet.</td></tr>
-            {% endif %}
-        </table>
-    </div>
-    <div class="footer">&copy; 2024 Intertechnic Jobs &mdash; All rights reserved</div>
-</body>
-</html>
-'''
+    return uk_calendar.add_business_days(collection_date, 1).strftime("%d/%m/%Y")
+
+
+
+def parse_history_cursor(value):
+    """Turn a 'timestamp.id' cursor from the query string into a (timestamp, id) tuple."""
+    timestamp, _, row_id = (value or '').rpartition('.')
+    if not timestamp or not row_id.isdigit():
+        return None
+    return timestamp, int(row_id)
+
+@lru_cache(maxsize=64)
+def render_history_page(before, snapshot_mtime, last_id):
+    """Render one page of the history table; the mtime and last_id arguments key the cache."""
+    rows, next_before = history_store.page(before=before, limit=HISTORY_PAGE_SIZE)
+    files = history_file_snapshot()[1]
+    rows = [row for row in rows if row['csv_path'].split('/')[-1] in files]
+    next_cursor = f'{next_before[0]}.{next_before[1]}' if next_before else None
+    return render_template('history_table.html', job_history=rows, before=before, next_before=next_cursor)
 
 def normalize_line_endings(text):
     return text.replace('\r\n', '\n').replace('\r', '\n')
@@ -573,17 +164,31 @@ def auto_delivery_date():
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     error = None
+    status = 200
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
-        user = users.get(username)
-        if user and user.get('enabled', False) and check_password(password, user['password']):
-            session['username'] = username
-            return redirect(url_for('index'))
-        error = 'Invalid credentials or account disabled.'
-    return render_template_string('''
-    <html><head><title>Login</title><style>body{background:#e0f2e9;font-family:sans-serif;} .login-box{background:#fff;max-width:400px;margin:80px auto;padding:40px 32px 32px 32px;border-radius:14px;box-shadow:0 4px 24px #1b6e3a22;} h2{color:#1b6e3a;} label{font-weight:600;} input{width:100%;padding:12px;margin:8px 0 18px 0;border-radius:7px;border:1.5px solid #bfc7d1;font-size:1.08em;} button{background:#1b6e3a;color:#fff;border:none;padding:14px 0;border-radius:8px;font-size:1.1em;width:100%;font-weight:700;box-shadow:0 2px 8px #1b6e3a22;} .error{color:#d00;margin-bottom:12px;}</style></head><body><div class="login-box"><h2>Login</h2>{% if error %}<div class="error">{{ error }}</div>{% endif %}<form method="POST"><label>Username:</label><input name="username" required><label>Password:</label><input name="password" type="password" required><button type="submit">Login</button></form></div></body></html>
-    ''', error=error)
+        client = request.remote_addr
+        if not login_throttle.allowed(client):
+            metrics.inc('logins_total', outcome='throttled')
+            error = 'Too many failed logins. Please wait a few minutes and try again.'
+            status = 429
+        else:
+            user = users.get(username)
+            try:
+                ok = bool(user and user.get('enabled', False) and password_verifier.verify(password, user['password']))
+            except (VerifierBusy, FutureTimeoutError):
+                metrics.inc('logins_total', outcome='busy')
+                return render_template('login.html', error='The server is busy. Please try again in a moment.'), 503
+            if ok:
+                metrics.inc('logins_total', outcome='ok')
+                login_throttle.reset(client)
+                session['username'] = username
+                return redirect(url_for('index'))
+            metrics.inc('logins_total', outcome='failed')
+            login_throttle.failed(client)
+            error = 'Invalid credentials or account disabled.'
+    return render_template('login.html', error=error), status
 
 @app.route('/logout')
 def logout():
@@ -593,203 +198,483 @@ def logout():
 @app.route('/history/<path:filename>')
 @login_required
 def protected_history_file(filename):
-    static_history_dir = os.path.join(os.path.dirname(__file__), 'static', 'history')
-    file_path = os.path.join(static_history_dir, filename)
+    file_path = os.path.join(HISTORY_DIR, filename)
     if not os.path.exists(file_path):
         abort(404)
     return send_file(file_path, as_attachment=True)
 
+PASTE_JOB_TYPES = ['AC01', 'BC04', 'EU01']
+SPREADSHEET_JOB_TYPES = ['GR11', 'CW09']
+
+def parse_input(job_type, job_data, upload, collection_date, delivery_date, progress=None):
+    """Parse pasted job text or an uploaded spreadsheet into (jobs, fieldnames)."""
+    if job_type in SPREADSHEET_JOB_TYPES:
+        parser = SpreadsheetParser(job_type)
+        metrics.inc('bytes_in_total', upload_size(upload), job_type=job_type)
+        with metrics.timer('read_file', job_type=job_type):
+            df = parser.read(upload)
+        with metrics.timer('parse', job_type=job_type):
+            jobs = parser.parse_dataframe(df)
+        metrics.inc('jobs_parsed_total', len(jobs), job_type=job_type)
+        jobs = screen_duplicates(job_type, jobs, collection_date)
+        if progress:
+            progress(len(jobs))
+        return jobs, GR11_FIELDNAMES
+    if job_type == 'BC04':
+        parser = BC04Parser(collection_date, delivery_date)
+    else:
+        parser = JobParser(collection_date, delivery_date)
+    metrics.inc('bytes_in_total', len(job_data.encode('utf-8')), job_type=job_type)
+    with metrics.timer('normalize', job_type=job_type):
+        text = normalize_line_endings(job_data)
+    with metrics.timer('parse', job_type=job_type):
+        if len(text) >= PARALLEL_THRESHOLD:
+            jobs = parser.parse_jobs_parallel(text)
+            if progress:
+                progress(len(jobs))
+        else:
+            jobs = []
+            for job in parser.iter_jobs(text):
+                jobs.append(job)
+                if progress:
+                    progress(len(jobs))
+    metrics.inc('jobs_parsed_total', len(jobs), job_type=job_type)
+    metrics.inc('jobs_rejected_total', parser.rejected, job_type=job_type)
+    jobs = screen_duplicates(job_type, jobs, collection_date)
+    return jobs, list(JOB_FIELDS) if jobs else []
+
+class AlreadyBooked(ValueError):
+    """Raised when DUPLICATE_MODE=drop removes every parsed job."""
+    def __init__(self, count):
+        super().__init__(f'All {count} parsed job(s) were already booked in an earlier batch, so nothing was exported.')
+        self.count = count
+
+def screen_duplicates(job_type, jobs, collection_date=None):
+    """Flag, or with DUPLICATE_MODE=drop remove, jobs already booked in an earlier batch, and remember the rest.
+
+    Spreadsheet rows carry no collection date, so they are keyed on the date entered for the upload (or today), which
+    lets a later delivery of the same vehicle through.
+    """
+    if DUPLICATE_MODE == 'off' or not jobs:
+        return jobs
+    booked = collection_date or datetime.now().strftime('%d/%m/%Y')
+    with metrics.timer('duplicates', job_type=job_type):
+        duplicates = seen_jobs.check_and_add([job_fingerprint(job.reg_number, job.vin, job.collection_date or booked) for job in jobs])
+    metrics.inc('jobs_duplicate_total', sum(duplicates), job_type=job_type)
+    if DUPLICATE_MODE == 'drop':
+        kept = [job for job, duplicate in zip(jobs, duplicates) if not duplicate]
+        if not kept:
+            raise AlreadyBooked(len(jobs))
+        return kept
+    for job, duplicate in zip(jobs, duplicates):
+        if duplicate:
+            job.special_instructions = DUPLICATE_MARKER + job.special_instructions
+    return jobs
+
+def upload_size(upload):
+    size = upload.seek(0, os.SEEK_END)
+    upload.seek(0)
+    return size
+
+def reserve_history_file(job_type, timestamp, part=None):
+    """Create an empty, previously unused history CSV and return its name, so exports in the same second never share a file."""
+    base = f"history_{job_type}_{timestamp}_{part}" if part else f"history_{job_type}_{timestamp}"
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    for n in itertools.count(1):
+        csv_filename = f'{base}.csv' if n == 1 else f'{base}_{n}.csv'
+        try:
+            with open(os.path.join(HISTORY_DIR, csv_filename), 'x', encoding='utf-8'):
+                return csv_filename
+        except FileExistsError:
+            continue
+
+def export_history_csv(job_type, jobs, fieldnames, user, cache_key=None, part=None):
+    """Return (timestamp, csv_filename, chunks). Iterating chunks writes the CSV to static/history and yields the same bytes for the response."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    csv_filename = reserve_history_file(job_type, timestamp, part)
+
+    def generate():
+        try:
+            yield
+        except GeneratorExit:
+            # Closed before the first chunk was asked for (e.g. the client went away): nothing was written
+            os.remove(os.path.join(HISTORY_DIR, csv_filename))
+            return
+        start = time.perf_counter()
+        sent = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        rows = iter(jobs)
+        with open(os.path.join(HISTORY_DIR, csv_filename), 'w', encoding='utf-8', newline='') as f:
+            def take():
+                data = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                f.write(data)
+                return data.encode('utf-8')
+            writer.writerow(fieldnames)
+            try:
+                for job in rows:
+                    writer.writerow(job.to_row(fieldnames))
+                    if buffer.tell() >= CSV_CHUNK_SIZE:
+                        chunk = take()
+                        sent += len(chunk)
+                        yield chunk
+                chunk = take()
+                sent += len(chunk)
+                yield chunk
+            except GeneratorExit:
+                # The client went away mid-download; finish the history copy anyway
+                for job in rows:
+                    writer.writerow(job.to_row(fieldnames))
+                take()
+        # Covers CSV serialization, the history file write and sending the response
+        metrics.observe('stage_seconds', time.perf_counter() - start, stage='export', job_type=job_type)
+        metrics.inc('bytes_out_total', sent, job_type=job_type)
+        with metrics.timer('save_history', job_type=job_type):
+            history_store.index_rows(f'history/{csv_filename}', job_type, timestamp, (job.to_row(history_store.INDEX_FIELDS) for job in jobs))
+            save_job_history({
+                'timestamp': timestamp,
+                'job_type': job_type,
+                'csv_path': f'history/{csv_filename}',
+                'user': user
+            })
+        if cache_key:
+            parse_cache.put(cache_key, {'timestamp': timestamp, 'csv_filename': csv_filename, 'jobs': len(jobs)})
+    chunks = generate()
+    # Run up to the first yield so closing the response before it starts still cleans up the reserved file
+    next(chunks)
+    return timestamp, csv_filename, chunks
+
+def csv_download(job_type, timestamp, chunks):
+    return Response(chunks, mimetype='text/csv', headers={'Content-Disposition': f'attachment; filename={job_type}_jobs_{timestamp}.csv'})
+
+def read_upload(upload):
+    """Copy an uploaded file into memory so it outlives the request."""
+    data = io.BytesIO(upload.read())
+    data.filename = upload.filename
+    return data
+
+def input_cache_key(job_type, job_data, upload, collection_date, delivery_date):
+    """Parse cache key for this input, or None when the duplicate check is on: a resent input must be screened again."""
+    if DUPLICATE_MODE != 'off':
+        return None
+    if job_type in SPREADSHEET_JOB_TYPES:
+        payload = upload.read()
+        upload.seek(0)
+        # Spreadsheet output depends on the makes and column aliases, so a reference data edit invalidates it
+        return parse_cache_key(job_type, payload, collection_date, delivery_date, reference_data.current().version)
+    payload = normalize_line_endings(job_data)
+    return parse_cache_key(job_type, payload, collection_date, delivery_date)
+
+def cached_export(cache_key):
+    """Return the cached parse result for this input if its history CSV is still on disk."""
+    if not cache_key:
+        return None
+    hit = parse_cache.get(cache_key)
+    if hit and os.path.exists(os.path.join(HISTORY_DIR, hit['csv_filename'])):
+        return hit
+    if hit:
+        parse_cache.discard(cache_key)
+    return None
+
+def run_background_parse(record, job_type, job_data, upload, collection_date, delivery_date, user):
+    def progress(count):
+        parse_queue.progress(record, count)
+    cache_key = input_cache_key(job_type, job_data, upload, collection_date, delivery_date)
+    hit = cached_export(cache_key)
+    if hit:
+        progress(hit['jobs'])
+        return {'csv_filename': hit['csv_filename'], 'download_name': f"{job_type}_jobs_{hit['timestamp']}.csv"}
+    jobs, fieldnames = parse_input(job_type, job_data, upload, collection_date, delivery_date, progress)
+    if not jobs:
+        raise ValueError('No valid jobs found.')
+    timestamp, csv_filename, chunks = export_history_csv(job_type, jobs, fieldnames, user, cache_key)
+    for _ in chunks:
+        pass
+    return {'csv_filename': csv_filename, 'download_name': f'{job_type}_jobs_{timestamp}.csv'}
+
+def input_size(job_type, job_data, upload):
+    if job_type in SPREADSHEET_JOB_TYPES:
+        return request.content_length or 0
+    return len(job_data)
+
+def submit_background_parse(job_type, job_data, upload, collection_date, delivery_date):
+    if upload:
+        upload = read_upload(upload)
+    user = session.get('username')
+    return parse_queue.submit(run_background_parse, job_type, job_data, upload, collection_date, delivery_date, user, user=user, job_type=job_type)
+
 @app.route('/', methods=['GET', 'POST'])
 @login_required
 def index():
-    global job_history
     error = None
     debug = None
+    start = time.perf_counter()
     job_type = request.form.get('job_type', 'AC01')
     job_data = request.form.get('job_data', '')
     collection_date = request.form.get('collection_date', datetime.now().strftime('%d/%m/%Y'))
     delivery_date = request.form.get('delivery_date', '')
+    if request.method == 'POST':
+        metrics.observe('stage_seconds', time.perf_counter() - start, stage='read_form', job_type=job_type)
 
     # Auto-set delivery date if not provided
     if not delivery_date:
-        if job_type == 'AC01':
-            delivery_date = calculate_delivery_date_ac01(collection_date)
-        elif job_type == 'BC04':
-            delivery_date = calculate_delivery_date_bc04(collection_date)
-        else:
-            delivery_date = collection_date
+        delivery_date = default_delivery_date(job_type, collection_date)
 
     if request.method == 'POST':
-        if job_type in ['AC01', 'BC04', 'EU01']:
-            job_data_norm = normalize_line_endings(job_data)
-            if job_type == 'AC01' or job_type == 'EU01':
-                parser = JobParser(collection_date, delivery_date)
-            elif job_type == 'BC04':
-                parser = BC04Parser(collection_date, delivery_date)
-            else:
-                parser = None
-            jobs = parser.parse_jobs(job_data_norm) if parser else []
-            if not jobs:
-                debug = f"<b>Debug:</b><br>Input preview (first 500 chars):<br><pre>{job_data_norm[:500]}</pre><br>Jobs found: 0"
-                error = "No valid jobs found. Please check your input format."
+        upload = request.files.get('file')
+        cache_key = None
+        hit = None
+        if job_type in PASTE_JOB_TYPES + SPREADSHEET_JOB_TYPES and (upload or job_type in PASTE_JOB_TYPES):
+            cache_key = input_cache_key(job_type, job_data, upload, collection_date, delivery_date)
+            hit = cached_export(cache_key)
+        if job_type in SPREADSHEET_JOB_TYPES and not upload:
+            error = "Please upload an Excel or CSV file."
+        elif hit:
+            # Same input as an earlier parse: send its history CSV instead of parsing again
+            metrics.inc('parses_total', job_type=job_type, outcome='cached')
+            return send_file(os.path.join(HISTORY_DIR, hit['csv_filename']), mimetype='text/csv', as_attachment=True, download_name=f"{job_type}_jobs_{hit['timestamp']}.csv")
+        elif job_type in PASTE_JOB_TYPES + SPREADSHEET_JOB_TYPES and input_size(job_type, job_data, upload) > ASYNC_PARSE_THRESHOLD:
+            # Large inputs are parsed in the background so the request returns straight away
+            try:
+                record = submit_background_parse(job_type, job_data, upload, collection_date, delivery_date)
+                metrics.inc('parses_total', job_type=job_type, outcome='queued')
+                debug = f"Large input queued for background parsing. <a href=\"{url_for('job_status', job_id=record['id'])}\">Check status</a>; the CSV will appear in Job History when done."
+            except queue.Full:
+                metrics.inc('parses_total', job_type=job_type, outcome='busy')
+                error = "The parser is busy. Please try again in a minute."
+        elif job_type in PASTE_JOB_TYPES:
+            try:
+                jobs, fieldnames = parse_input(job_type, job_data, None, collection_date, delivery_date)
+                if not jobs:
+                    metrics.inc('parses_total', job_type=job_type, outcome='no_jobs')
+                    debug = f"<b>Debug:</b><br>Input preview (first 500 chars):<br><pre>{normalize_line_endings(job_data)[:500]}</pre><br>Jobs found: 0"
+                    error = "No valid jobs found. Please check your input format."
+                else:
+                    metrics.inc('parses_total', job_type=job_type, outcome='ok')
+                    # Add to job history (user is placeholder for now)
+                    timestamp, _, chunks = export_history_csv(job_type, jobs, fieldnames, None, cache_key)
+                    return csv_download(job_type, timestamp, chunks)
+            except AlreadyBooked as e:
+                metrics.inc('parses_total', job_type=job_type, outcome='duplicates')
+                error = str(e)
+        elif job_type in SPREADSHEET_JOB_TYPES:
+            try:
+                jobs, fieldnames = parse_input(job_type, job_data, upload, collection_date, delivery_date)
+                if not jobs:
+                    metrics.inc('parses_total', job_type=job_type, outcome='no_jobs')
+                    error = "No valid jobs found in the file."
+                else:
+                    metrics.inc('parses_total', job_type=job_type, outcome='ok')
+                    timestamp, _, chunks = export_history_csv(job_type, jobs, fieldnames, session.get('username'), cache_key)
+                    return csv_download(job_type, timestamp, chunks)
+            except AlreadyBooked as e:
+                metrics.inc('parses_total', job_type=job_type, outcome='duplicates')
+                error = str(e)
+            except Exception as e:
+                metrics.inc('parses_total', job_type=job_type, outcome='failed')
+                error = f"Failed to process file: {e}"
+    # The history table is cached per page until a new record is stored or static/history changes
+    history_html = render_history_page(parse_history_cursor(request.args.get('before')), history_file_snapshot()[0], history_store.last_id())
+    return render_template('index.html', job_type=job_type, job_data=job_data, collection_date=collection_date, delivery_date=delivery_date, error=error, debug=debug, history_html=history_html, username=session.get('username'))
+
+_index_backfill = None
+
+def backfill_job_index():
+    """Index history CSVs from before the lookup index existed, once per process, in the background."""
+    global _index_backfill
+    if _index_backfill is None and os.path.isdir(HISTORY_DIR):
+        _index_backfill = threading.Thread(target=history_store.index_history_dir, args=(HISTORY_DIR,), name='index-backfill', daemon=True)
+        _index_backfill.start()
+
+@app.route('/search')
+@login_required
+def search_jobs():
+    """Find the exported batch a vehicle was in by a prefix of its REG NUMBER, VIN or YOUR REF NO."""
+    backfill_job_index()
+    query = request.args.get('q', '')
+    if len(history_store.index_key(query)) < 2:
+        return jsonify({'error': 'Search for at least 2 characters.'}), 400
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    with metrics.timer('search'):
+        results = history_store.search(query, limit)
+    for result in results:
+        result['url'] = url_for('protected_history_file', filename=result['csv_path'].split('/', 1)[-1])
+    return jsonify({'query': query, 'results': results})
+
+@app.route('/preview', methods=['POST'])
+@login_required
+def preview():
+    """Parse pasted text as the user types. Only blocks whose content changed since this session's last preview are reparsed."""
+    job_type = request.form.get('job_type', 'AC01')
+    if job_type not in PASTE_JOB_TYPES:
+        return jsonify({'error': 'Preview is only available for pasted jobs.'}), 400
+    collection_date = request.form.get('collection_date') or datetime.now().strftime('%d/%m/%Y')
+    delivery_date = request.form.get('delivery_date') or default_delivery_date(job_type, collection_date)
+    text = normalize_line_endings(request.form.get('job_data', ''))
+    session_id = session.setdefault('preview_id', uuid.uuid4().hex)
+    parser = (BC04Parser if job_type == 'BC04' else JobParser)(collection_date, delivery_date)
+    cached = preview_cache.blocks(session_id)
+    blocks = {}
+    jobs = []
+    reparsed = rejected = 0
+    with metrics.timer('preview', job_type=job_type):
+        for block in parser.iter_job_texts(text):
+            key = BlockCache.block_key(job_type, collection_date, delivery_date, block)
+            if key in blocks:
+                job = blocks[key]
+            elif key in cached:
+                job = blocks[key] = cached[key]
             else:
-                output = io.StringIO()
-                writer = csv.DictWriter(output, fieldnames=jobs[0].keys())
-                writer.writeheader()
-                writer.writerows(jobs)
-                output.seek(0)
-                # Save CSV to static/history with timestamp
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                csv_filename = f"history_{job_type}_{timestamp}.csv"
-                static_history_dir = os.path.join(os.path.dirname(__file__), 'static', 'history')
-                os.makedirs(static_history_dir, exist_ok=True)
-                csv_path = os.path.join(static_history_dir, csv_filename)
-                with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-                    f.write(output.getvalue())
-                # Add to job history (user is placeholder for now)
-                job_history.insert(0, {
-                    'timestamp': timestamp,
-                    'job_type': job_type,
-                    'csv_path': f'history/{csv_filename}',
-                    'user': None
-                })
-                save_job_history(job_history)
-                return send_file(io.BytesIO(output.getvalue().encode('utf-8')), mimetype='text/csv', as_attachment=True, download_name=f'{job_type}_jobs_{timestamp}.csv')
-        elif job_type in ['GR11', 'CW09']:
-            file = request.files.get('file')
-            if not file:
-                error = "Please upload an Excel or CSV file."
+                job = blocks[key] = parser.parse_job_text(block)
+                reparsed += 1
+            if job:
+                jobs.append(job)
             else:
-                try:
-                    df = pd.read_excel(file) if file.filename.endswith('.xlsx') else pd.read_csv(file)
-                    # Find columns case-insensitively
-                    colmap = {}
-                    for col in df.columns:
-                        cl = col.strip().lower()
-                        if cl in ['reg no', 'reg number', 'registration', 'reg']: colmap['reg'] = col
-                        elif cl in ['pdi centre', 'pdi', 'pdi_center']: colmap['pdi'] = col
-                        elif cl in ['model']: colmap['model'] = col
-                        elif cl in ['chassis', 'vin']: colmap['chassis'] = col
-                        elif cl in ['delivery due date', 'delivery date', 'del date']: colmap['date'] = col
-                        elif cl in ['delivery address', 'address', 'delivery addr']: colmap['address'] = col
-                        elif cl in ['price']: colmap['price'] = col
-                        elif cl in ['special instructions', 'special']: colmap['special'] = col
-                    jobs = []
-                    makes = ["FORD", "VAUXHALL", "VOLKSWAGEN", "VW", "BMW", "MERCEDES", "AUDI", "TOYOTA", "HONDA", "NISSAN", "HYUNDAI", "KIA", "SKODA", "SEAT", "RENAULT", "PEUGEOT", "CITROEN", "FIAT", "MAZDA", "VOLVO"]
-                    for _, row in df.iterrows():
-                        reg = str(row.get(colmap.get('reg',''), '')).strip()
-                        if not reg: continue
-                        vin = str(row.get(colmap.get('chassis',''), '')).strip()
-                        model = str(row.get(colmap.get('model',''), '')).strip()
-                        make = ''
-                        m_model = model
-                        for m in makes:
-                            if m.lower() in model.lower():
-                                make = m
-                                if model.lower().startswith(m.lower()):
-                                    m_model = model[len(m):].strip()
-                                break
-                        pdi_centre = str(row.get(colmap.get('pdi',''), '')).upper() if colmap.get('pdi') else ''
-                        if 'UPPER' in pdi_centre or 'HEYFORD' in pdi_centre:
-                            customer_ref = 'GR15'
-                            collection_addr1 = 'Greenhous Upper Heyford'
-                            collection_addr2 = 'Heyford Park, Bicester'
-                            collection_addr3 = 'Bicester'
-                            collection_addr4 = 'UPPER HEYFORD'
-                            collection_postcode = 'OX25 5HA'
-                        else:
-                            customer_ref = 'GR11'
-                            collection_addr1 = 'Greenhous High Ercall'
-                            collection_addr2 = 'Greenhous Village Osbaston'
-                            collection_addr3 = 'High Ercall'
-                            collection_addr4 = ''
-                            collection_postcode = 'TF6 6RA'
-                        your_ref = reg
-                        delivery_date = str(row.get(colmap.get('date',''), '')).strip()
-                        delivery_addr = str(row.get(colmap.get('address',''), '')).strip()
-                        # Split delivery address into ADDR1-4 and POSTCODE
-                        addr1 = addr2 = addr3 = addr4 = dpostcode = ''
-                        if delivery_addr:
-                            address_parts = [a.strip() for a in re.split(r',|\n', delivery_addr) if a.strip()]
-                            if address_parts:
-                                addr1 = address_parts[0]
-                                addr2 = address_parts[1] if len(address_parts) > 1 else ''
-                                addr3 = address_parts[2] if len(address_parts) > 2 else ''
-                                addr4 = address_parts[3] if len(address_parts) > 3 else ''
-                                # Try to find postcode in any part
-                                postcode_pattern = r'\b([A-Z]{1,2}\d{1,2}[A-Z]? ?\d[A-Z]{2})\b'
-                                for i, part in enumerate(address_parts):
-                                    m = re.search(postcode_pattern, part.upper())
-                                    if m:
-                                        dpostcode = m.group(1)
-                                        # Remove postcode from addr part
-                                        address_parts[i] = address_parts[i].replace(dpostcode, '').strip()
-                                        break
-                        special_instructions = str(row.get(colmap.get('special',''), '')).strip()
-                        price = str(row.get(colmap.get('price',''), '')).strip()
-                        special_instructions = f"VIN: {vin} " + special_instructions if special_instructions else f"VIN: {vin}"
-                        jobs.append({
-                            'REG NUMBER': reg,
-                            'VIN': vin,
-                            'MAKE': make,
-                            'MODEL': m_model,
-                            'COLLECTION ADDR1': collection_addr1,
-                            'COLLECTION ADDR2': collection_addr2,
-                            'COLLECTION ADDR3': collection_addr3,
-                            'COLLECTION ADDR4': collection_addr4,
-                            'COLLECTION POSTCODE': collection_postcode,
-                            'YOUR REF NO': your_ref,
-                            'DELIVERY ADDR1': addr1,
-                            'DELIVERY ADDR2': addr2,
-                            'DELIVERY ADDR3': addr3,
-                            'DELIVERY ADDR4': addr4,
-                            'DELIVERY POSTCODE': dpostcode,
-                            'SPECIAL INSTRUCTIONS': special_instructions,
-                            'PRICE': price,
-                            'CUSTOMER REF': 'GR11/GR15',
-                            'TRANSPORT TYPE': ''
-                        })
-                    if not jobs:
-                        error = "No valid jobs found in the file."
-                    else:
-                        output = io.StringIO()
-                        fieldnames = [
-                            'REG NUMBER', 'VIN', 'MAKE', 'MODEL',
-                            'COLLECTION DATE', 'YOUR REF NO',
-                            'COLLECTION ADDR1', 'COLLECTION ADDR2', 'COLLECTION ADDR3', 'COLLECTION ADDR4', 'COLLECTION POSTCODE',
-                            'DELIVERY DATE',
-                            'DELIVERY ADDR1', 'DELIVERY ADDR2', 'DELIVERY ADDR3', 'DELIVERY ADDR4', 'DELIVERY POSTCODE',
-                            'SPECIAL INSTRUCTIONS', 'PRICE', 'CUSTOMER REF', 'TRANSPORT TYPE'
-                        ]
-                        writer = csv.DictWriter(output, fieldnames=fieldnames)
-                        writer.writeheader()
-                        writer.writerows(jobs)
-                        output.seek(0)
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        csv_filename = f"history_{job_type}_{timestamp}.csv"
-                        static_history_dir = os.path.join(os.path.dirname(__file__), 'static', 'history')
-                        os.makedirs(static_history_dir, exist_ok=True)
-                        csv_path = os.path.join(static_history_dir, csv_filename)
-                        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-                            f.write(output.getvalue())
-                        job_history.insert(0, {
-                            'timestamp': timestamp,
-                            'job_type': job_type,
-                            'csv_path': f'history/{csv_filename}',
-                            'user': session.get('username')
-                        })
-                        save_job_history(job_history)
-                        return send_file(io.BytesIO(output.getvalue().encode('utf-8')), mimetype='text/csv', as_attachment=True, download_name=f'{job_type}_jobs_{timestamp}.csv')
-                except Exception as e:
-                    error = f"Failed to process file: {e}"
-    # List all CSVs in static/history for job history
-    static_history_dir = os.path.join(os.path.dirname(__file__), 'static', 'history')
-    if os.path.exists(static_history_dir):
-        files = sorted(os.listdir(static_history_dir), reverse=True)
-        job_history = [row for row in job_history if os.path.exists(os.path.join(static_history_dir, row['csv_path'].split('/')[-1]))]
-    else:
-        files = []
-    return render_template_string(TEMPLATE, job_type=job_type, job_data=job_data, collection_date=collection_date, delivery_date=delivery_date, error=error, debug=debug, job_history=job_history, username=session.get('username'))
+                rejected += 1
+        preview_cache.replace(session_id, blocks)
+        # Peek only, so previewing never marks jobs as already booked
+        duplicates = seen_jobs.check([job_fingerprint(job.reg_number, job.vin, job.collection_date) for job in jobs]) if DUPLICATE_MODE != 'off' else [False] * len(jobs)
+    rows = [dict(job.to_dict(), duplicate=duplicate) for job, duplicate in zip(jobs, duplicates)]
+    return jsonify({'count': len(rows), 'rejected': rejected, 'reparsed': reparsed, 'duplicates': sum(duplicates), 'jobs': rows})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Scrapers authenticate with a bearer token when METRICS_TOKEN is set
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def visible_job(job_id):
+    record = parse_queue.get(job_id)
+    if not record or (record['user'] != session.get('username') and not is_admin()):
+        abort(404)
+    return record
+
+@app.route('/jobs', methods=['POST'])
+@login_required
+def submit_job():
+    job_type = request.form.get('job_type', 'AC01')
+    job_data = request.form.get('job_data', '')
+    collection_date = request.form.get('collection_date', datetime.now().strftime('%d/%m/%Y'))
+    delivery_date = request.form.get('delivery_date', '') or default_delivery_date(job_type, collection_date)
+    upload = request.files.get('file')
+    if job_type not in PASTE_JOB_TYPES + SPREADSHEET_JOB_TYPES:
+        return jsonify({'error': f'Unknown job type {job_type}.'}), 400
+    if job_type in SPREADSHEET_JOB_TYPES and not upload:
+        return jsonify({'error': 'Please upload an Excel or CSV file.'}), 400
+    try:
+        record = submit_background_parse(job_type, job_data, upload, collection_date, delivery_date)
+    except queue.Full:
+        return jsonify({'error': 'The parser is busy. Please try again in a minute.'}), 503
+    return jsonify({'id': record['id'], 'status': record['status'], 'status_url': url_for('job_status', job_id=record['id'])}), 202
+
+# Bad archives, encrypted members (RuntimeError), unsupported compression (NotImplementedError) and corrupt data
+ZIP_ERRORS = (zipfile.BadZipFile, RuntimeError, NotImplementedError, zlib.error, EOFError)
+
+def zip_error_message(e):
+    if isinstance(e, RuntimeError):
+        return 'File is password protected; upload it without a password.'
+    if isinstance(e, NotImplementedError):
+        return 'File uses an unsupported zip compression method.'
+    return str(e) or 'File is not a valid zip file.'
+
+def expand_batch_uploads(uploads):
+    """Return ([(filename, bytes)], report) for a batch upload, unpacking zips. report lists files that were skipped.
+
+    Unpacked files count against BATCH_MAX_CONTENT_LENGTH in total, so a zip of many members cannot fill memory.
+    """
+    files, report = [], []
+    total = 0
+    for upload in uploads:
+        name = upload.filename or ''
+        if name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(upload) as archive:
+                    for info in archive.infolist():
+                        inner = f'{name}/{info.filename}'
+                        if info.is_dir() or info.filename.startswith('__MACOSX/') or not info.filename.lower().endswith(SPREADSHEET_EXTENSIONS):
+                            continue
+                        if total + info.file_size > BATCH_MAX_CONTENT_LENGTH:
+                            report.append({'file': inner, 'rows': 0, 'error': 'Batch is too large; upload this file separately.'})
+                            continue
+                        try:
+                            data = archive.read(info)
+                        except ZIP_ERRORS as e:
+                            # Encrypted or unsupported members are reported on their own; the rest still parse
+                            report.append({'file': inner, 'rows': 0, 'error': zip_error_message(e)})
+                            continue
+                        total += len(data)
+                        files.append((inner, data))
+            except ZIP_ERRORS as e:
+                report.append({'file': name, 'rows': 0, 'error': zip_error_message(e)})
+        elif name.lower().endswith(SPREADSHEET_EXTENSIONS):
+            data = upload.read()
+            total += len(data)
+            files.append((name, data))
+        else:
+            report.append({'file': name, 'rows': 0, 'error': 'Not an Excel, CSV or zip file.'})
+    return files, report
+
+@app.route('/batch', methods=['POST'])
+@login_required
+def batch_upload():
+    """Parse many GR11/CW09 spreadsheets (or zips of them) into one CSV, or one CSV per customer ref with split=customer_ref."""
+    request.max_content_length = BATCH_MAX_CONTENT_LENGTH
+    job_type = request.form.get('job_type', 'GR11')
+    collection_date = request.form.get('collection_date')
+    split = request.form.get('split') == 'customer_ref'
+    if job_type not in SPREADSHEET_JOB_TYPES:
+        return jsonify({'error': f'Batch upload is only for {", ".join(SPREADSHEET_JOB_TYPES)} spreadsheets.'}), 400
+    files, report = expand_batch_uploads(request.files.getlist('files') + request.files.getlist('file'))
+    if not files and not report:
+        return jsonify({'error': 'Please upload one or more Excel, CSV or zip files.'}), 400
+    metrics.inc('bytes_in_total', sum(len(data) for _, data in files), job_type=job_type)
+    with metrics.timer('parse', job_type=job_type):
+        results = parse_spreadsheets(files, BATCH_WORKERS, job_type) if files else []
+    # One bad sheet is reported against its file rather than failing the batch
+    groups = {}
+    for filename, jobs, error in results:
+        try:
+            jobs = screen_duplicates(job_type, jobs, collection_date)
+        except AlreadyBooked as e:
+            jobs, error = [], error or str(e)
+        if not jobs and not error:
+            error = 'No valid jobs found in the file.'
+        report.append({'file': filename, 'rows': len(jobs), 'error': error})
+        for job in jobs:
+            groups.setdefault(job.customer_ref if split else None, []).append(job)
+    metrics.inc('jobs_parsed_total', sum(len(jobs) for jobs in groups.values()), job_type=job_type)
+    outputs = []
+    for customer_ref, jobs in groups.items():
+        part = re.sub(r'[^A-Za-z0-9]+', '-', customer_ref) if customer_ref else None
+        _, csv_filename, chunks = export_history_csv(job_type, jobs, GR11_FIELDNAMES, session.get('username'), part=part)
+        for _ in chunks:
+            pass
+        outputs.append({'customer_ref': customer_ref, 'rows': len(jobs), 'url': url_for('protected_history_file', filename=csv_filename)})
+    metrics.inc('parses_total', job_type=job_type, outcome='batch' if outputs else 'no_jobs')
+    return jsonify({'files': report, 'outputs': outputs}), 200 if outputs else 422
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    record = visible_job(job_id)
+    body = {k: record[k] for k in ('id', 'status', 'job_type', 'submitted', 'jobs_parsed', 'error')}
+    body['queued'] = parse_queue.pending()
+    if record['status'] == 'done':
+        body['result_url'] = url_for('job_result', job_id=job_id)
+    return jsonify(body)
+
+@app.route('/jobs/<job_id>/result')
+@login_required
+def job_result(job_id):
+    record = visible_job(job_id)
+    if record['status'] != 'done':
+        return jsonify({'error': f"Job is {record['status']}."}), 409
+    result = record['result']
+    return send_file(os.path.join(HISTORY_DIR, result['csv_filename']), mimetype='text/csv', as_attachment=True, download_name=result['download_name'])
 
 def is_admin():
     return session.get('username') in ['admin', 'bradlakin1']
@@ -805,35 +690,59 @@ def admin_panel():
         username = request.form.get('username', '').strip()
         if action == 'add':
             password = request.form.get('password', '')
-            if username in users:
-                msg = f'User {username} already exists.'
-            else:
-                users[username] = {'password': hash_password(password), 'enabled': True}
-                save_users(users)
+            if users.add(username, hash_password(password)):
                 msg = f'User {username} added and enabled.'
+            else:
+                msg = f'User {username} already exists.'
         elif action == 'enable':
-            if username in users:
-                users[username]['enabled'] = True
-                save_users(users)
+            if users.update(username, enabled=True):
                 msg = f'User {username} enabled.'
         elif action == 'disable':
-            if username in users:
-                users[username]['enabled'] = False
-                save_users(users)
+            if users.update(username, enabled=False):
                 msg = f'User {username} disabled.'
         elif action == 'setpw':
             password = request.form.get('password', '')
-            if username in users:
-                users[username]['password'] = hash_password(password)
-                save_users(users)
+            if users.update(username, password=hash_password(password)):
                 msg = f'Password updated for {username}.'
-    return render_template_string('''
-    <html><head><title>Admin Panel</title><style>body{background:#e0f2e9;font-family:sans-serif;} .admin-box{background:#fff;max-width:600px;margin:40px auto;padding:40px 32px 32px 32px;border-radius:14px;box-shadow:0 4px 24px #1b6e3a22;} h2{color:#1b6e3a;} table{width:100%;border-collapse:collapse;margin-bottom:24px;} th,td{border:1px solid #bfc7d1;padding:8px 10px;} th{background:#f5f7fa;} tr:nth-child(even){background:#f7f9fc;} .btn{background:#1b6e3a;color:#fff;border:none;padding:6px 16px;border-radius:6px;font-size:1em;font-weight:600;margin:0 2px;} .btn:disabled{background:#bfc7d1;} .msg{color:#1b6e3a;margin-bottom:12px;font-weight:600;} .form-row{margin-bottom:18px;} label{font-weight:600;}</style></head><body><div class="admin-box"><h2>User Management</h2>{% if msg %}<div class="msg">{{ msg }}</div>{% endif %}<table><tr><th>Username</th><th>Status</th><th>Actions</th></tr>{% for u, v in users.items() %}<tr><td>{{ u }}</td><td>{{ 'ENABLED' if v.enabled else 'DISABLED' }}</td><td><form method="post" style="display:inline"><input type="hidden" name="username" value="{{ u }}"><button class="btn" name="action" value="enable" {% if v.enabled %}disabled{% endif %}>Enable</button><button class="btn" name="action" value="disable" {% if not v.enabled %}disabled{% endif %}>Disable</button></form><form method="post" style="display:inline"><input type="hidden" name="username" value="{{ u }}"><input type="text" name="password" placeholder="New password" required style="width:110px;"><button class="btn" name="action" value="setpw">Set Password</button></form></td></tr>{% endfor %}</table><h3>Add New User</h3><form method="post"><div class="form-row"><label>Username:</label><input name="username" required></div><div class="form-row"><label>Password:</label><input name="password" type="password" required></div><button class="btn" name="action" value="add">Add User</button></form><div style="margin-top:24px;"><a href="/">Back to main</a></div></div></body></html>
-    ''', users={u: type('obj', (), v) for u, v in users.items()}, msg=msg)
+    return render_template('admin.html', users={u: type('obj', (), v) for u, v in users.all().items()}, msg=msg)
+
+@lru_cache(maxsize=None)
+def asset_version(filename):
+    with open(os.path.join(STATIC_DIR, filename), 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()[:10]
+
+@app.template_global()
+def asset_url(filename):
+    """URL for a static asset, versioned by content so it can be cached for a long time."""
+    return url_for('static_files', filename=filename, v=asset_version(filename))
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    return send_file(os.path.join(os.path.dirname(__file__), 'static', filename))
+    # Exported CSVs hold customer details; they are only served by /history/<file>, behind login
+    if os.path.normpath(filename).split(os.sep)[0] == 'history':
+        abort(404)
+    # Only content-versioned URLs from asset_url can be cached for long
+    return send_from_directory(STATIC_DIR, filename, max_age=STATIC_MAX_AGE if 'v' in request.args else None)
+
+def reopen_stores():
+    """Give a freshly forked worker its own SQLite connections and metrics snapshot."""
+    history_store.reopen()
+    users.reopen()
+    login_throttle.reopen()
+    seen_jobs.reopen()
+    metrics.reset()
+
+def shutdown(timeout=30):
+    """Let queued background parses finish, commit the queued history writes, then close the stores, within timeout seconds."""
+    deadline = time.monotonic() + timeout
+    if not parse_queue.drain(timeout):
+        app.logger.warning('Shutdown: background parses were still running after %ss', timeout)
+    if not history_store.close(max(deadline - time.monotonic(), 0)):
+        app.logger.warning('Shutdown: history writes were dropped or still queued (%s pending)', history_store.pending.qsize())
+    users.close()
+    login_throttle.close()
+    seen_jobs.close()
+    metrics.flush()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
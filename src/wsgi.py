@@ -0,0 +1,24 @@
+"""Production entry point. gunicorn.conf.py imports this module once and forks the workers from it:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(__file__))
+from job_parser_core import uk_calendar
+from web_app import app, asset_version, STATIC_DIR
+
+
+def preload():
+    """Build what every worker would otherwise build on its first request, so the forked workers share it."""
+    uk_calendar.add_business_days(date.today(), 1)
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    for name in os.listdir(STATIC_DIR):
+        if os.path.isfile(os.path.join(STATIC_DIR, name)):
+            asset_version(name)
+
+
+preload()